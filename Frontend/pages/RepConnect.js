@@ -9,9 +9,12 @@ export default function BasicForm() {
   const [submissions, setSubmissions] = useState([]);
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [showSuccessModal, setShowSuccessModal] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
  
   const API_BASE_URL = 'http://localhost:8000'; 
+  const PAGE_SIZE = 50;
 
   const handleSubmit = async () => {
     if (!name.trim() || !email.trim() || !message.trim()) {
@@ -66,17 +69,19 @@ export default function BasicForm() {
   const clearHistory = () => {
     fetchMessages(); 
   };
-    const fetchMessages = async () => {
+    // the newest page first; older pages are fetched from X-Next-Cursor on scroll or "Load more"
+    const fetchMessages = async (cursor = null) => {
       try {
-        const response = await fetch(`${API_BASE_URL}/api/messages`);
+        const query = cursor ? `limit=${PAGE_SIZE}&cursor=${encodeURIComponent(cursor)}` : `limit=${PAGE_SIZE}`;
+        const response = await fetch(`${API_BASE_URL}/api/messages?${query}`);
         if (!response.ok) {
           throw new Error('Failed to fetch messages');
         }
         const data = await response.json();
         
         
-        const transformedMessages = data.map((msg, index) => ({
-          id: index + 1, 
+        const transformedMessages = data.map((msg) => ({
+          id: msg.id, 
           name: msg.sender,
           email: msg.email,
           message: msg.message,
@@ -85,7 +90,8 @@ export default function BasicForm() {
           priority: 'medium' 
         }));
         
-        setSubmissions(transformedMessages);
+        setSubmissions(prev => cursor ? [...prev, ...transformedMessages] : transformedMessages);
+        setNextCursor(response.headers.get('X-Next-Cursor'));
       } catch (error) {
         console.error('Error fetching messages:', error);
         Alert.alert('Error', 'Failed to load messages. Please try again.');
@@ -98,6 +104,22 @@ export default function BasicForm() {
       fetchMessages();
     }, []);
 
+    const loadMoreMessages = async () => {
+      if (!nextCursor || loadingMore) {
+        return;
+      }
+      setLoadingMore(true);
+      await fetchMessages(nextCursor);
+      setLoadingMore(false);
+    };
+
+    const onHistoryScroll = ({ nativeEvent }) => {
+      const { layoutMeasurement, contentOffset, contentSize } = nativeEvent;
+      if (layoutMeasurement.height + contentOffset.y >= contentSize.height - 100) {
+        loadMoreMessages();
+      }
+    };
+
 
   return (
     <View style={{ flex: 1 }}>
@@ -172,7 +194,12 @@ export default function BasicForm() {
               <Text style={styles.emptyStateSubtitle}>No submissions yet</Text>
             </View>
           ) : (
-            <ScrollView style={styles.submissionsScrollView} nestedScrollEnabled={true}>
+            <ScrollView
+              style={styles.submissionsScrollView}
+              nestedScrollEnabled={true}
+              onScroll={onHistoryScroll}
+              scrollEventThrottle={200}
+            >
               {submissions.map((submission, index) => (
                 <View key={submission.id} style={styles.submissionCard}>
                   <View style={styles.cardHeader}>
@@ -200,6 +227,11 @@ export default function BasicForm() {
                   </View>
                 </View>
               ))}
+              {nextCursor && (
+                <TouchableOpacity style={styles.loadMoreButton} onPress={loadMoreMessages} disabled={loadingMore}>
+                  <Text style={styles.loadMoreButtonText}>{loadingMore ? 'Loading...' : 'Load more'}</Text>
+                </TouchableOpacity>
+              )}
             </ScrollView>
           )}
         </View>
@@ -260,6 +292,18 @@ const styles = StyleSheet.create({
   submissionsScrollView: {
     flex: 1,
   },
+  loadMoreButton: {
+    backgroundColor: 'rgb(242, 242, 242)',
+    padding: 12,
+    borderRadius: 8,
+    alignItems: 'center',
+    marginBottom: 10,
+  },
+  loadMoreButtonText: {
+    fontSize: 16,
+    fontWeight: 'bold',
+    color: '#007AFF',
+  },
   title: {
     fontSize: 24,
     fontWeight: 'bold',
@@ -18,12 +18,16 @@ export default function InteractiveCalendar() {
 
   useEffect(() => {
     fetchEvents();
-  }, []);
+  }, [currentMonth]);
 
   const fetchEvents = async () => {
     try {
-      const response = await fetch('http://localhost:8000/api/getEvent');
+      const month = `${currentMonth.getFullYear()}-${String(currentMonth.getMonth() + 1).padStart(2, '0')}`;
+      const response = await fetch(`http://localhost:8000/api/getEvent?month=${month}`);
       const events = await response.json();
+      if (response.headers.get('X-Events-Truncated')) {
+        console.warn(`Only some of the events for ${month} were loaded`);
+      }
       
 
       const groupedEvents = {};
@@ -10,14 +10,40 @@ export default function AdminMessagesPage() {
   const [clearAllConfirmation, setClearAllConfirmation] = useState(false);
   const [filterStatus, setFilterStatus] = useState('all');
   const [sortOrder, setSortOrder] = useState('newest');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [stats, setStats] = useState({ total: 0, unread: 0, read: 0 });
 
 
   const API_BASE_URL = 'http://localhost:8000';
+  const PAGE_SIZE = 50;
 
 
-  const fetchMessages = async () => {
+  // the counts cover the whole inbox, not just the pages loaded so far
+  const fetchStats = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/messages`);
+      const response = await fetch(`${API_BASE_URL}/api/messages/stats`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      setStats(await response.json());
+    } catch (error) {
+      console.error('Error fetching message stats:', error);
+    }
+  };
+
+  // One page at a time: the first page on open or refresh, the next one (from X-Next-Cursor)
+  // when the list is scrolled to the end or "Load more" is pressed
+  const fetchMessages = async (cursor = null) => {
+    try {
+      const params = [`limit=${PAGE_SIZE}`];
+      if (filterStatus !== 'all') {
+        params.push(`unread=${filterStatus === 'unread'}`);
+      }
+      if (cursor) {
+        params.push(`cursor=${encodeURIComponent(cursor)}`);
+      }
+      const response = await fetch(`${API_BASE_URL}/api/messages?${params.join('&')}`);
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
@@ -34,7 +60,8 @@ export default function AdminMessagesPage() {
         priority: 'medium'
       }));
       
-      setMessages(transformedMessages);
+      setMessages(prevMessages => cursor ? [...prevMessages, ...transformedMessages] : transformedMessages);
+      setNextCursor(response.headers.get('X-Next-Cursor'));
       
     } catch (error) {
       console.error('Error fetching messages:', error);
@@ -44,75 +71,91 @@ export default function AdminMessagesPage() {
     }
   };
 
+  const loadMoreMessages = async () => {
+    if (!nextCursor || loadingMore) {
+      return;
+    }
+    setLoadingMore(true);
+    await fetchMessages(nextCursor);
+    setLoadingMore(false);
+  };
+
+  const onMessagesScroll = ({ nativeEvent }) => {
+    const { layoutMeasurement, contentOffset, contentSize } = nativeEvent;
+    if (layoutMeasurement.height + contentOffset.y >= contentSize.height - 100) {
+      loadMoreMessages();
+    }
+  };
+
  
   useEffect(() => {
     fetchMessages();
+  }, [filterStatus]);
+
+  useEffect(() => {
+    fetchStats();
   }, []);
 
 
   const onRefresh = async () => {
     setRefreshing(true);
-    await fetchMessages();
+    await Promise.all([fetchMessages(), fetchStats()]);
     setRefreshing(false);
   };
 
-  const unreadCount = messages.filter(msg => !msg.isRead).length;
+  const unreadCount = stats.unread;
 
-  const markAsRead = async (id) => {
-    try {
+  // updates the loaded list in place; on failure only that message is put back
+  const setReadStatus = async (id, isRead) => {
+    setMessages(prevMessages => 
+      prevMessages.map(msg => 
+        msg.id === id ? { ...msg, isRead } : msg
+      )
+    );
+    setStats(prev => ({
+      ...prev,
+      unread: prev.unread + (isRead ? -1 : 1),
+      read: prev.read + (isRead ? 1 : -1)
+    }));
+
+    const response = await fetch(`${API_BASE_URL}/api/messages/${id}/read`, {
+      method: 'PUT',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ is_read: isRead })
+    });
 
+    if (!response.ok) {
       setMessages(prevMessages => 
         prevMessages.map(msg => 
-          msg.id === id ? { ...msg, isRead: true } : msg
+          msg.id === id ? { ...msg, isRead: !isRead } : msg
         )
       );
-      
+      fetchStats();
+      throw new Error(`Failed to mark message as ${isRead ? 'read' : 'unread'}: ${response.status}`);
+    }
 
-      const response = await fetch(`${API_BASE_URL}/api/messages/${id}/read`, {
-        method: 'PUT',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ is_read: true })
-      });
-      
-      if (!response.ok) {
-        throw new Error(`Failed to mark message as read: ${response.status}`);
-      }
-      
-      const result = await response.json();
+    return response.json();
+  };
+
+  const markAsRead = async (id) => {
+    try {
+      const result = await setReadStatus(id, true);
       console.log("Mark as read response:", result);
       
     } catch (error) {
       console.error('Error marking message as read:', error);
       console.log('Failed to mark message as read');
-      await fetchMessages();
     }
   };
 
   const markAsUnread = async (id) => {
     try {
-      setMessages(prevMessages => 
-        prevMessages.map(msg => 
-          msg.id === id ? { ...msg, isRead: false } : msg
-        )
-      );
-
-      const response = await fetch(`${API_BASE_URL}/api/messages/${id}/read`, {
-        method: 'PUT',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ is_read: false })
-      });
-      
-      if (!response.ok) {
-        throw new Error(`Failed to mark message as unread: ${response.status}`);
-      }
-      
-      const result = await response.json();
+      const result = await setReadStatus(id, false);
       console.log("Mark as unread response:", result);
       
     } catch (error) {
       console.error('Error marking message as unread:', error);
       console.log('Failed to mark message as unread');
-      await fetchMessages();
     }
   };
 
@@ -145,13 +188,14 @@ export default function AdminMessagesPage() {
       
 
       setMessages(prevMessages => prevMessages.filter(msg => msg.id !== id));
+      fetchStats();
       
       console.log('Message deleted successfully');
       
     } catch (error) {
+      // nothing was removed locally, so there is nothing to reload
       console.error('Error deleting message:', error);
       console.log(`Failed to delete message: ${error.message}`);
-      await fetchMessages();
     }
   };
 
@@ -182,14 +226,14 @@ export default function AdminMessagesPage() {
       const result = await response.json();
       console.log("Clear all response:", result);
       setMessages([]);
+      setNextCursor(null);
+      setStats({ total: 0, unread: 0, read: 0 });
       
       console.log(result.message || 'All messages cleared successfully');
       
     } catch (error) {
       console.error('Error clearing messages:', error);
       console.log(`Failed to clear messages: ${error.message}`);
-
-      await fetchMessages();
     }
   };
 
@@ -260,7 +304,7 @@ export default function AdminMessagesPage() {
           <View style={styles.statsContainer}>
             <View style={styles.statRow}>
               <Text style={styles.statLabel}>Total Messages:</Text>
-              <Text style={styles.statValue}>{messages.length}</Text>
+              <Text style={styles.statValue}>{stats.total}</Text>
             </View>
             <View style={styles.statRow}>
               <Text style={styles.statLabel}>Unread:</Text>
@@ -271,7 +315,7 @@ export default function AdminMessagesPage() {
             <View style={styles.statRow}>
               <Text style={styles.statLabel}>Read:</Text>
               <Text style={[styles.statValue, { color: 'rgb(31, 31, 31)' }]}>
-                {messages.length - unreadCount}
+                {stats.read}
               </Text>
             </View>
           </View>
@@ -333,7 +377,7 @@ export default function AdminMessagesPage() {
           <View style={styles.filterSection}>
             
             
-            {messages.length > 0 && (
+            {stats.total > 0 && (
               <TouchableOpacity style={styles.clearAllButton} onPress={clearAllMessages}>
                 <Text style={styles.clearAllButtonText}>Clear All Messages</Text>
               </TouchableOpacity>
@@ -356,7 +400,12 @@ export default function AdminMessagesPage() {
               </Text>
             </View>
           ) : (
-            <ScrollView style={styles.messagesScrollView} nestedScrollEnabled={true}>
+            <ScrollView
+              style={styles.messagesScrollView}
+              nestedScrollEnabled={true}
+              onScroll={onMessagesScroll}
+              scrollEventThrottle={200}
+            >
               {getFilteredAndSortedMessages().map((message, index) => (
                 <View key={message.id} style={[
                   styles.messageCard,
@@ -421,6 +470,15 @@ export default function AdminMessagesPage() {
                   </View>
                 </View>
               ))}
+              {nextCursor && (
+                <TouchableOpacity style={styles.loadMoreButton} onPress={loadMoreMessages} disabled={loadingMore}>
+                  {loadingMore ? (
+                    <ActivityIndicator size="small" color="#007AFF" />
+                  ) : (
+                    <Text style={styles.loadMoreButtonText}>Load more</Text>
+                  )}
+                </TouchableOpacity>
+              )}
             </ScrollView>
           )}
         </View>
@@ -458,7 +516,7 @@ export default function AdminMessagesPage() {
           <View style={styles.confirmationModal}>
             <Text style={styles.confirmationTitle}>Clear All Messages</Text>
             <Text style={styles.confirmationText}>
-              Are you sure you want to delete all {messages.length} messages? This action cannot be undone.
+              Are you sure you want to delete all {stats.total} messages? This action cannot be undone.
             </Text>
             <View style={styles.confirmationButtons}>
               <TouchableOpacity 
@@ -511,6 +569,18 @@ const styles = StyleSheet.create({
   messagesScrollView: {
     maxHeight: 600,
   },
+  loadMoreButton: {
+    backgroundColor: 'rgb(242, 242, 242)',
+    padding: 12,
+    borderRadius: 8,
+    alignItems: 'center',
+    marginBottom: 10,
+  },
+  loadMoreButtonText: {
+    fontSize: 16,
+    fontWeight: 'bold',
+    color: '#007AFF',
+  },
   title: {
     fontSize: 24,
     fontWeight: 'bold',
@@ -11,6 +11,27 @@ import {
 } from 'react-native';
 
 const API_BASE_URL = 'http://localhost:8000/api';
+const VOTER_TOKEN_KEY = 'nextup.voterToken';
+
+let sessionVoterToken = null;
+
+// One random token per device, sent with every vote so the server can turn away a second
+// vote on the same poll. It is kept in localStorage on web; without storage (native) it
+// lasts until the app restarts.
+const getVoterToken = () => {
+  const storage = typeof localStorage !== 'undefined' ? localStorage : null;
+  let token = sessionVoterToken || (storage && storage.getItem(VOTER_TOKEN_KEY));
+  if (!token) {
+    token = typeof crypto !== 'undefined' && crypto.randomUUID
+      ? crypto.randomUUID()
+      : Array.from({ length: 32 }, () => Math.floor(Math.random() * 16).toString(16)).join('');
+    if (storage) {
+      storage.setItem(VOTER_TOKEN_KEY, token);
+    }
+  }
+  sessionVoterToken = token;
+  return token;
+};
 
 const UserPage = () => {
   const [polls, setPolls] = useState([]);
@@ -61,6 +82,7 @@ const UserPage = () => {
         body: JSON.stringify({
           selected_option_id: selectedOptionId,
           text_response: textResponse,
+          voter_token: getVoterToken(),
         }),
       });
 
@@ -73,6 +95,8 @@ const UserPage = () => {
         setTimeout(() => {
           setShowSuccessModal(false);
         }, 2500);
+      } else if (response.status === 409) {
+        console.warn('You have already voted in this poll');
       } else {
         console.error('Failed to submit response');
       }
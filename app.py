@@ -1,67 +1,1093 @@
-from flask import Flask, g, jsonify, request
+from flask import Flask, Response, g, has_request_context, jsonify, make_response, request, stream_with_context
+import click
+import cProfile
 import psycopg2
 from flask_cors import CORS
 import psycopg2.extras
 import os
+import atexit
+import pstats
+import base64
+import csv
+import functools
+import hashlib
+import heapq
+import importlib
+import io
+import json
+import math
+import queue
+import random
+import re
+import select
+import struct
+import threading
+import time
+import uuid
 import requests
-import numpy as np
-from collections import Counter
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
 
 
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Events-Truncated'])
 
 CONFIG = {
     'host': 'localhost',
     'database': 'civic_app',
     'user': 'akurukunda01',
     'secret_key' : 'king',
-    'port': 5432
+    'port': 5432,
+    'pool_min': 2,
+    'pool_max': 20,
+    'pool_timeout': 10,
+    'pool_check_after': 30,
+    'categorize_workers': 2,
+    'categorize_batch_size': 32,
+    'categorize_batch_wait': 0.5,
+    'categorize_retries': 3,
+    'categorize_backoff': 0.5,
+    'categorize_lease': 300,
+    'category_index_cache_size': 256,
+    'classifier_backend': 'huggingface',
+    'messages_page_size': 50,
+    'messages_max_page_size': 200,
+    'stream_itersize': 2000,
+    'message_stats_ttl': 5,
+    'bulk_max_ids': 1000,
+    'sse_heartbeat': 15,
+    'sse_queue_size': 256,
+    'response_cache_size': 512,
+    'events_limit': 500,
+    'bulk_max_polls': 500,
+    'poll_meta_cache_ttl': 60,
+    'poll_meta_unlistened_ttl': 1,
+    'vote_ingest_mode': 'direct',
+    'vote_flush_interval_ms': 50,
+    'vote_batch_max': 500,
+    'vote_buffer_max': 20000,
+    'require_voter_token': True,
+    'vote_dead_letter_path': os.environ.get('NEXTUP_DEAD_LETTER_PATH',
+                                            os.path.join(os.path.expanduser('~'), '.nextup', 'vote_dead_letters.jsonl')),
+    'category_taxonomy_path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'categories.json'),
+    'bulk_max_titles': 500,
+    'suggest_max_categories': 10,
+    'cluster_max_responses': 50000,
+    'cluster_cache_size': 64,
+    'duplicate_threshold': 0.7,
+    'duplicate_max_candidates': 50,
+    'search_page_size': 20,
+    'search_max_page_size': 100,
+    'profile_sample_rate': 0.0,
+    'profile_dir': None,
+    'profile_top': 25,
+    'pure_cosine_max_categories': 16,
+    'pure_cosine_max_responses': 64
 }
 
+
+class PoolExhausted(Exception):
+    pass
+
+
+class ConnectionPool:
+
+    def __init__(self, minconn, maxconn, timeout, check_after, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_after = check_after
+        self.connect_kwargs = connect_kwargs
+        self._idle = []
+        self._in_use = set()
+        self._cond = threading.Condition()
+        self._waiting = 0
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'reconnects': 0,
+            'discarded': 0
+        }
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    def _healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if len(self._in_use) < self.maxconn:
+                    conn, idle_since = None, None
+                    break
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolExhausted(f"No database connection available after {self.timeout}s")
+                waited = True
+                self._waiting += 1
+                self._cond.wait(remaining)
+                self._waiting -= 1
+            # reserve the slot before doing any network I/O outside the lock
+            placeholder = object()
+            self._in_use.add(placeholder)
+
+        try:
+            if conn is not None and not self._healthy(conn, idle_since):
+                self._discard(conn)
+                conn = None
+                with self._cond:
+                    self._stats['reconnects'] += 1
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use.discard(placeholder)
+                self._cond.notify()
+            raise
+
+        wait_time = time.monotonic() - start
+        with self._cond:
+            self._in_use.discard(placeholder)
+            self._in_use.add(conn)
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_total'] += wait_time
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+        return conn
+
+    def putconn(self, conn, error=None):
+        keep = not conn.closed
+        if keep:
+            try:
+                status = conn.get_transaction_status()
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    keep = False
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        with self._cond:
+            self._in_use.discard(conn)
+            if keep and len(self._idle) + len(self._in_use) < self.maxconn:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        with self._cond:
+            self._stats['discarded'] += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def closeall(self):
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'min': self.minconn,
+                'max': self.maxconn,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'waiting': self._waiting
+            })
+        stats['wait_time_avg'] = stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+        return stats
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+class Histogram:
+
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, dict(value, counts=list(value['counts']))) for key, value in sorted(self._series.items())]
+        for label_values, value in series:
+            labels = dict(zip(self.labels, label_values))
+            for bound, count in zip(self.buckets, value['counts']):
+                lines.append(f"{self.name}_bucket{format_labels(labels, le=bound)} {count}")
+            lines.append(f"{self.name}_bucket{format_labels(labels, le='+Inf')} {value['count']}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {value['sum']}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {value['count']}")
+        return lines
+
+
+def format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+request_latency = Histogram('nextup_request_duration_seconds', "Time spent in each route", ('endpoint', 'method'))
+request_db_queries = Histogram('nextup_request_db_queries', "Database queries issued per request", ('endpoint',), COUNT_BUCKETS)
+request_db_time = Histogram('nextup_request_db_seconds', "Time spent in the database per request", ('endpoint',))
+db_query_latency = Histogram('nextup_db_query_duration_seconds', "Latency of individual database queries", ('context',))
+classifier_latency = Histogram('nextup_classifier_duration_seconds', "Latency of classifier backend calls", ('backend',))
+request_statuses = Counter()
+profiles_taken = Counter()
+_request_metrics_lock = threading.Lock()
+
+
+class TimedCursorMixin:
+    """Times every statement and charges it to the current request, if any."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(time.perf_counter() - start)
+
+
+class TimedCursor(TimedCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+
+class TimedDictCursor(TimedCursorMixin, psycopg2.extras.RealDictCursor):
+    pass
+
+
+def record_query(elapsed):
+    if has_request_context() and 'request_start' in g:
+        g.db_queries += 1
+        g.db_time += elapsed
+        db_query_latency.observe(elapsed, 'request')
+    else:
+        db_query_latency.observe(elapsed, 'background')
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.db_queries = 0
+    g.db_time = 0.0
+    g.classifier_time = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    endpoint = request.endpoint or 'unmatched'
+    request_latency.observe(elapsed, endpoint, request.method)
+    request_db_queries.observe(g.db_queries, endpoint)
+    request_db_time.observe(g.db_time, endpoint)
+    with _request_metrics_lock:
+        request_statuses[(endpoint, request.method, response.status_code)] += 1
+    
+    # streamed bodies are still being generated here, so this is time to first byte for them
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={g.db_time * 1000:.1f};desc="{g.db_queries} queries"',
+        f'classifier;dur={g.classifier_time * 1000:.1f}',
+        f'total;dur={elapsed * 1000:.1f}'
+    ])
+    return response
+
+
+def cprofile_hook(endpoint, view, args, kwargs):
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(view, *args, **kwargs)
+    finally:
+        if CONFIG['profile_dir']:
+            os.makedirs(CONFIG['profile_dir'], exist_ok=True)
+            path = os.path.join(CONFIG['profile_dir'], f"{endpoint}-{int(time.time())}-{uuid.uuid4().hex[:8]}.prof")
+            profiler.dump_stats(path)
+        else:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(CONFIG['profile_top'])
+            print(f"Profile of {endpoint}:\n{out.getvalue()}")
+
+_profile_hook = cprofile_hook
+
+def set_profile_hook(hook):
+    """hook(endpoint, view, args, kwargs) must call the view and return its result."""
+    global _profile_hook
+    _profile_hook = hook or cprofile_hook
+
+def slow_handler(view):
+    # profiles a sample of calls; with profile_sample_rate at 0 this is just a pass-through
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        rate = CONFIG['profile_sample_rate']
+        if rate <= 0 or random.random() >= rate:
+            return view(*args, **kwargs)
+        with _request_metrics_lock:
+            profiles_taken[request.endpoint] += 1
+        return _profile_hook(request.endpoint, view, args, kwargs)
+    return wrapper
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    CONFIG['pool_min'],
+                    CONFIG['pool_max'],
+                    CONFIG['pool_timeout'],
+                    CONFIG['pool_check_after'],
+                    dbname=CONFIG['database'],
+                    user=CONFIG['user'],
+                    host=CONFIG['host'],
+                    port=CONFIG['port'],
+                    cursor_factory=TimedCursor
+                )
+    return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+@contextmanager
+def pooled_connection():
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    except Exception as e:
+        pool.putconn(conn, e)
+        raise
+    else:
+        pool.putconn(conn)
+
 def get_db():
     if 'db' not in g:
-        g.db = psycopg2.connect(
-            dbname=CONFIG['database'],
-            user=CONFIG['user'],
-            host=CONFIG['host'],
-            port=CONFIG['port']
-        )
-        g.cursor = g.db.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        g.db = get_pool().getconn()
+        g.cursor = g.db.cursor(cursor_factory=TimedDictCursor)
     return g.db, g.cursor
 
 def close_db(e=None):
+    cursor = g.pop('cursor', None)
     db = g.pop('db', None)
 
+    if cursor is not None and not cursor.closed:
+        cursor.close()
     if db is not None:
-        db.close()
+        get_pool().putconn(db, e)
 
 @app.teardown_appcontext
 def close_db_connection(error):
     close_db(error)
 
+@app.route('/api/poolStats', methods=['GET'])
+def getPoolStats():
+    if _pool is None:
+        return jsonify({'status': 'not_initialized'}), 200
+    return jsonify(_pool.stats()), 200
+
+
+NOTIFY_CHANNEL = 'nextup_changes'
+NOTIFY_TOPICS = ('messages', 'polls', 'events')
+# NOTIFY payloads must stay under 8000 bytes, so big id lists are split up and
+# oversized bodies (long descriptions, titles) are cut down to their ids
+NOTIFY_MAX_IDS = 500
+NOTIFY_MAX_BYTES = 7900
+NOTIFY_ID_KEYS = ('id', 'ids', 'poll_id')
+
+def notify_payload(topic, action, data):
+    payload = json.dumps({'topic': topic, 'action': action, 'data': data}, default=str, ensure_ascii=False)
+    if len(payload.encode('utf-8')) < NOTIFY_MAX_BYTES:
+        return payload
+    # clients refetch the record when they see truncated
+    data = {key: data[key] for key in NOTIFY_ID_KEYS if key in data}
+    data['truncated'] = True
+    return json.dumps({'topic': topic, 'action': action, 'data': data}, default=str)
+
+def notify_change(cursor, topic, action, data):
+    # Sent inside the caller's transaction; Postgres only delivers it on commit
+    cursor.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, notify_payload(topic, action, data)))
+
+def notify_ids(cursor, topic, action, ids, **extra):
+    for start in range(0, len(ids), NOTIFY_MAX_IDS):
+        notify_change(cursor, topic, action, dict(extra, ids=ids[start:start + NOTIFY_MAX_IDS]))
+
+
+class Subscriber:
+
+    def __init__(self, topics, maxsize):
+        self.topics = topics
+        self.queue = queue.Queue(maxsize)
+        self.dropped = False
+
+
+class ChangeHub:
+
+    def __init__(self):
+        self._subscribers = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+        # False until LISTEN is up; while it is down this process can miss other workers' writes
+        self.connected = False
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen_forever, name="change-hub", daemon=True)
+                self._thread.start()
+
+    def subscribe(self, topics):
+        self.start()
+        subscriber = Subscriber(topics, CONFIG['sse_queue_size'])
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def add_listener(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Change listener failed: {str(e)}")
+        for subscriber in subscribers:
+            if event['topic'] not in subscriber.topics:
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except queue.Full:
+                # a client that cannot keep up is cut off and has to reload and reconnect
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+
+    def _listen_forever(self):
+        delay = 1
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"Change listener disconnected: {str(e)}")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def _listen(self):
+        # One dedicated connection outside the pool: it sits in LISTEN for the life of the process
+        conn = psycopg2.connect(
+            dbname=CONFIG['database'],
+            user=CONFIG['user'],
+            host=CONFIG['host'],
+            port=CONFIG['port'],
+            # a silently dropped connection would otherwise look like a quiet channel
+            keepalives=1,
+            keepalives_idle=30,
+            keepalives_interval=10,
+            keepalives_count=3
+        )
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            self.connected = True
+            # anything written before LISTEN (or while reconnecting) was never seen; tell
+            # listeners and clients to drop what they hold
+            for topic in NOTIFY_TOPICS:
+                self.publish({'topic': topic, 'action': 'resync', 'data': {}})
+            while True:
+                if select.select([conn], [], [], CONFIG['sse_heartbeat']) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notification = conn.notifies.pop(0)
+                    try:
+                        self.publish(json.loads(notification.payload))
+                    except ValueError:
+                        print(f"Ignoring malformed notification: {notification.payload!r}")
+        finally:
+            self.connected = False
+            conn.close()
+
+
+change_hub = ChangeHub()
+
+@app.route('/api/stream', methods=['GET'])
+def streamChanges():
+    topics = request.args.get('topics')
+    topics = set(topics.split(',')) if topics else set(NOTIFY_TOPICS)
+    unknown = topics - set(NOTIFY_TOPICS)
+    if unknown:
+        return jsonify({'error': f"Unknown topics: {', '.join(sorted(unknown))}"}), 400
+    
+    subscriber = change_hub.subscribe(topics)
+    
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while not subscriber.dropped:
+                try:
+                    event = subscriber.queue.get(timeout=CONFIG['sse_heartbeat'])
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['topic']}\ndata: {json.dumps(event, default=str)}\n\n"
+            yield "event: overflow\ndata: {}\n\n"
+        finally:
+            change_hub.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+class ResponseCache:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._versions = Counter()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def version(self, namespace):
+        with self._lock:
+            return self._versions[namespace]
+
+    def bump(self, *namespaces):
+        with self._lock:
+            for namespace in namespaces:
+                self._versions[namespace] += 1
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['version'] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, key, version, body, mimetype, headers=None):
+        entry = {
+            'version': version,
+            'body': body,
+            'mimetype': mimetype,
+            'headers': headers or {},
+            'etag': hashlib.sha256(body).hexdigest()[:32]
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return entry
+
+
+response_cache = ResponseCache(CONFIG['response_cache_size'])
+
+# Change notifications that make cached list responses stale. Votes are
+# deliberately left out so a busy poll does not keep emptying the poll list cache.
+CACHE_INVALIDATING_CHANGES = {
+    'events': {'created', 'updated', 'deleted', 'resync'},
+    'polls': {'created', 'updated', 'deleted', 'resync'}
+}
+
+def _invalidate_from_change(event):
+    if event.get('action') in CACHE_INVALIDATING_CHANGES.get(event.get('topic'), ()):
+        response_cache.bump(event['topic'])
+
+# Other worker processes learn about writes through the same NOTIFY channel
+change_hub.add_listener(_invalidate_from_change)
+
+def cached_response(namespace, vary=None):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            change_hub.start()
+            if not change_hub.connected:
+                # without the listener a write in another worker would never evict our entry
+                return view(*args, **kwargs)
+            
+            version = response_cache.version(namespace)
+            key = (request.endpoint, tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))),
+                   vary() if vary else None)
+            entry = response_cache.get(key, version)
+            if entry is None:
+                rv = make_response(view(*args, **kwargs))
+                if rv.status_code != 200 or rv.is_streamed:
+                    return rv
+                # our own X- headers (e.g. truncation flags) are part of the response
+                headers = {name: value for name, value in rv.headers.items() if name.startswith('X-')}
+                entry = response_cache.put(key, version, rv.get_data(), rv.mimetype, headers)
+            
+            if request.if_none_match.contains(entry['etag']):
+                response_cache.not_modified += 1
+                response = Response(status=304)
+            else:
+                response = Response(entry['body'], mimetype=entry['mimetype'], headers=entry['headers'])
+            response.set_etag(entry['etag'])
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+MESSAGE_FIELDS = {
+    'id': 'id',
+    'sender': 'sender',
+    'message': 'content',
+    'email': 'sender_email',
+    'timestamp': 'timestamp',
+    'is_read': 'is_read'
+}
+
+def parse_bool_arg(value):
+    if value is None or isinstance(value, bool):
+        return value
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Invalid boolean value '{value}'")
+
+def encode_message_cursor(row):
+    raw = json.dumps([row['timestamp'].isoformat(), row['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_message_cursor(cursor_arg):
+    try:
+        timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor_arg.encode()))
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def message_filters(args):
+    clauses = []
+    params = []
+    
+    unread = parse_bool_arg(args.get('unread'))
+    if unread is True:
+        clauses.append("NOT is_read")
+    elif unread is False:
+        clauses.append("is_read")
+    
+    email = args.get('email')
+    if email:
+        clauses.append("lower(sender_email) = lower(%s)")
+        params.append(email)
+    
+    for name, op in (('since', '>='), ('until', '<')):
+        value = args.get(name)
+        if value:
+            try:
+                params.append(datetime.fromisoformat(value))
+            except ValueError:
+                raise ValueError(f"Invalid {name} date '{value}'")
+            clauses.append(f"timestamp {op} %s")
+    
+    return clauses, params
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+    'csv': 'text/csv'
+}
+
+def stream_rows(query, params, columns, row_fn, fmt, filename):
+    conn, _ = get_db()
+    # A named cursor keeps the result set on the server; only itersize rows are in memory at a time
+    cursor = conn.cursor(name=f"export_{uuid.uuid4().hex}", cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.itersize = CONFIG['stream_itersize']
+    cursor.execute(query, params)
+    
+    def generate():
+        try:
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+                writer.writeheader()
+            elif fmt == 'json':
+                yield "["
+            first = True
+            while True:
+                rows = cursor.fetchmany(cursor.itersize)
+                if not rows:
+                    break
+                if fmt == 'csv':
+                    writer.writerows(row_fn(row) for row in rows)
+                    chunk = buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                elif fmt == 'json':
+                    chunk = ",".join(app.json.dumps(row_fn(row)) for row in rows)
+                    if not first:
+                        chunk = "," + chunk
+                else:
+                    chunk = "".join(app.json.dumps(row_fn(row)) + "\n" for row in rows)
+                first = False
+                yield chunk
+            if fmt == 'json':
+                yield "]"
+        finally:
+            cursor.close()
+    
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    if fmt == 'csv':
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+MINHASH_PERMUTATIONS = 64
+# 16 bands of 4 rows: pairs above ~0.5 Jaccard similarity almost always share a bucket
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+_minhash_rng = random.Random(1729)
+_MINHASH_PARAMS = [
+    (_minhash_rng.randrange(1, _MERSENNE_PRIME), _minhash_rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+def message_shingles(text):
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < 3:
+        return set(words) or {text.lower()}
+    return {' '.join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+def minhash_signature(text):
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), 'little')
+              for s in message_shingles(text)]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) & 0xffffffff for a, b in _MINHASH_PARAMS]
+
+def pack_signature(signature):
+    return struct.pack(f'<{MINHASH_PERMUTATIONS}I', *signature)
+
+def unpack_signature(data):
+    return struct.unpack(f'<{MINHASH_PERMUTATIONS}I', bytes(data))
+
+def lsh_buckets(signature):
+    # the band number is part of the hash, so buckets from different bands never collide
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<H{LSH_ROWS}I', band, *rows), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+    return buckets
+
+def estimated_similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / MINHASH_PERMUTATIONS
+
+def find_duplicate_group(cursor, signature, buckets):
+    # Only group representatives are in the buckets, so the lookup grows with the number
+    # of distinct groups sharing a bucket, not with how many copies a campaign has sent
+    cursor.execute("""
+        SELECT DISTINCT m.id, m.minhash
+        FROM message_lsh_buckets b
+        JOIN rep_connect_messages m ON m.id = b.message_id
+        WHERE b.bucket = ANY(%s)
+        ORDER BY m.id DESC
+        LIMIT %s
+    """, (buckets, CONFIG['duplicate_max_candidates']))
+    
+    best_group, best_similarity = None, CONFIG['duplicate_threshold']
+    for row in cursor.fetchall():
+        similarity = estimated_similarity(signature, unpack_signature(row['minhash']))
+        if similarity >= best_similarity:
+            best_group, best_similarity = row['id'], similarity
+    return best_group
+
+def store_message_signature(cursor, message_id, text):
+    signature = minhash_signature(text)
+    buckets = lsh_buckets(signature)
+    group = find_duplicate_group(cursor, signature, buckets)
+    cursor.execute("UPDATE rep_connect_messages SET minhash = %s, duplicate_group = %s WHERE id = %s",
+                  (psycopg2.Binary(pack_signature(signature)), group, message_id))
+    if group is None:
+        # a new group; later copies are matched against this message alone
+        psycopg2.extras.execute_values(cursor,
+            "INSERT INTO message_lsh_buckets (bucket, message_id) VALUES %s ON CONFLICT DO NOTHING",
+            [(bucket, message_id) for bucket in buckets])
+    return group
+
+# Per-group counts for the unfiltered grouped inbox, updated in the same transaction
+# as each message write, like the poll tallies
+def add_to_message_group(cursor, group_id, message_id, timestamp, is_read):
+    cursor.execute("""
+        INSERT INTO message_groups (group_id, count, unread, latest, latest_id)
+        VALUES (%s, 1, %s, %s, %s)
+        ON CONFLICT (group_id) DO UPDATE SET
+            count = message_groups.count + 1,
+            unread = message_groups.unread + EXCLUDED.unread,
+            latest = CASE WHEN (EXCLUDED.latest, EXCLUDED.latest_id) > (message_groups.latest, message_groups.latest_id)
+                          THEN EXCLUDED.latest ELSE message_groups.latest END,
+            latest_id = CASE WHEN (EXCLUDED.latest, EXCLUDED.latest_id) > (message_groups.latest, message_groups.latest_id)
+                             THEN EXCLUDED.latest_id ELSE message_groups.latest_id END
+    """, (group_id, 0 if is_read else 1, timestamp, message_id))
+
+def update_message_groups(cursor, deltas):
+    deltas = {group_id: delta for group_id, delta in deltas.items() if any(delta)}
+    if deltas:
+        psycopg2.extras.execute_values(cursor, """
+            UPDATE message_groups g
+            SET count = g.count + d.count, unread = g.unread + d.unread
+            FROM (VALUES %s) AS d (group_id, count, unread)
+            WHERE g.group_id = d.group_id
+        """, [(group_id, count, unread) for group_id, (count, unread) in deltas.items()])
+
+def mark_message_groups_read(cursor, group_ids, is_read):
+    # group_ids has one entry per message whose is_read actually changed
+    update_message_groups(cursor, {group_id: (0, -n if is_read else n)
+                                   for group_id, n in Counter(group_ids).items()})
+
+def remove_from_message_groups(cursor, deleted):
+    deltas = {}
+    for row in deleted:
+        count, unread = deltas.get(row['group_id'], (0, 0))
+        deltas[row['group_id']] = (count - 1, unread - (not row['is_read']))
+    if not deltas:
+        return
+    update_message_groups(cursor, deltas)
+    groups = list(deltas)
+    cursor.execute("DELETE FROM message_groups WHERE group_id = ANY(%s) AND count <= 0", (groups,))
+    # a group that lost its newest message is listed by the next newest one
+    cursor.execute("""
+        UPDATE message_groups g
+        SET (latest, latest_id) = (
+            SELECT m.timestamp, m.id
+            FROM rep_connect_messages m
+            WHERE COALESCE(m.duplicate_group, m.id) = g.group_id
+            ORDER BY m.timestamp DESC, m.id DESC
+            LIMIT 1
+        )
+        WHERE g.group_id = ANY(%s) AND g.latest_id = ANY(%s)
+    """, (groups, [row['id'] for row in deleted]))
+
+def rebuild_message_groups(cursor):
+    # same locking as rebuild_tallies: concurrent writes wait and apply their change on top
+    cursor.execute("LOCK TABLE message_groups IN EXCLUSIVE MODE")
+    cursor.execute("DELETE FROM message_groups")
+    cursor.execute("""
+        INSERT INTO message_groups (group_id, count, unread, latest, latest_id)
+        SELECT g.group_id, g.count, g.unread, r.timestamp, r.id
+        FROM (
+            SELECT COALESCE(duplicate_group, id) AS group_id,
+                   COUNT(*) AS count,
+                   COUNT(*) FILTER (WHERE NOT is_read) AS unread
+            FROM rep_connect_messages
+            GROUP BY 1
+        ) g
+        JOIN LATERAL (
+            SELECT timestamp, id
+            FROM rep_connect_messages
+            WHERE COALESCE(duplicate_group, id) = g.group_id
+            ORDER BY timestamp DESC, id DESC
+            LIMIT 1
+        ) r ON TRUE
+    """)
+
+def getMessageGroups(clauses, params, after, limit):
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    page = "WHERE (g.latest, g.group_id) < (%s, %s)" if after else ""
+    
+    conn, cursor = get_db()
+    if not clauses:
+        # the whole inbox: read the maintained summaries instead of aggregating every message
+        cursor.execute(f"""
+            SELECT g.group_id, g.count, g.unread, g.latest, r.sender, r.sender_email, r.content
+            FROM message_groups g
+            JOIN rep_connect_messages r ON r.id = g.latest_id
+            {page}
+            ORDER BY g.latest DESC, g.group_id DESC
+            LIMIT %s
+        """, (list(after) if after else []) + [limit + 1])
+    else:
+        cursor.execute(f"""
+            SELECT g.group_id, g.count, g.unread, g.latest, r.sender, r.sender_email, r.content
+            FROM (
+                SELECT COALESCE(duplicate_group, id) AS group_id,
+                       COUNT(*) AS count,
+                       COUNT(*) FILTER (WHERE NOT is_read) AS unread,
+                       MAX(timestamp) AS latest
+                FROM rep_connect_messages
+                {where}
+                GROUP BY 1
+            ) g
+            JOIN LATERAL (
+                SELECT sender, sender_email, content
+                FROM rep_connect_messages
+                WHERE COALESCE(duplicate_group, id) = g.group_id
+                ORDER BY timestamp DESC, id DESC
+                LIMIT 1
+            ) r ON TRUE
+            {page}
+            ORDER BY g.latest DESC, g.group_id DESC
+            LIMIT %s
+        """, params + (list(after) if after else []) + [limit + 1])
+    groups = cursor.fetchall()
+    
+    has_more = len(groups) > limit
+    groups = groups[:limit]
+    response = jsonify([{
+        'group_id': grp['group_id'],
+        'count': grp['count'],
+        'unread': grp['unread'],
+        'latest': grp['latest'],
+        'sender': grp['sender'],
+        'email': grp['sender_email'],
+        'message': grp['content']
+    } for grp in groups])
+    if has_more:
+        response.headers['X-Next-Cursor'] = encode_message_cursor({'timestamp': groups[-1]['latest'], 'id': groups[-1]['group_id']})
+    return response
 
 @app.route('/api/messages', methods=['GET'])
 def getMessages():
     try:
+        try:
+            limit = int(request.args.get('limit', CONFIG['messages_page_size']))
+            limit = max(1, min(limit, CONFIG['messages_max_page_size']))
+            
+            fields = request.args.get('fields')
+            fields = fields.split(',') if fields else list(MESSAGE_FIELDS)
+            unknown = [f for f in fields if f not in MESSAGE_FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            
+            clauses, params = message_filters(request.args)
+            cursor_arg = request.args.get('cursor')
+            after = decode_message_cursor(cursor_arg) if cursor_arg else None
+            grouped = parse_bool_arg(request.args.get('grouped'))
+            fmt = request.args.get('format')
+            if fmt and fmt not in EXPORT_FORMATS:
+                raise ValueError(f"Unsupported format '{fmt}'")
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if fmt:
+            # export everything matching the filters instead of a single page
+            columns = [MESSAGE_FIELDS[f] for f in fields]
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            return stream_rows(f"""
+                SELECT {', '.join(columns)}
+                FROM rep_connect_messages
+                {where}
+                ORDER BY timestamp DESC, id DESC
+            """, params, fields, lambda m: {f: m[MESSAGE_FIELDS[f]] for f in fields}, fmt, 'messages')
+        
+        if grouped:
+            return getMessageGroups(clauses, params, after, limit)
+        
+        if after:
+            clauses.append("(timestamp, id) < (%s, %s)")
+            params.extend(after)
+        
+        # id and timestamp are always needed to build the next cursor
+        columns = ['id', 'timestamp'] + [MESSAGE_FIELDS[f] for f in fields if MESSAGE_FIELDS[f] not in ('id', 'timestamp')]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
         conn, cursor = get_db()
-        cursor.execute("SELECT * FROM rep_connect_messages ORDER BY timestamp DESC")
+        cursor.execute(f"""
+            SELECT {', '.join(columns)}
+            FROM rep_connect_messages
+            {where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT %s
+        """, params + [limit + 1])
         messages = cursor.fetchall()
-        msg_list = []
-        for m in messages:
-            msg_list.append({
-                "id": m["id"],
-                "sender": m["sender"],
-                "message": m["content"],
-                "email": m["sender_email"],
-                "timestamp": m["timestamp"],
-                "is_read": m["is_read"]
-            })
-        conn.close()
-        return jsonify(msg_list)
+        
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        msg_list = [{f: m[MESSAGE_FIELDS[f]] for f in fields} for m in messages]
+        
+        response = jsonify(msg_list)
+        if has_more:
+            response.headers['X-Next-Cursor'] = encode_message_cursor(messages[-1])
+        return response
     except Exception as e:
         print(f"Error fetching messages: {e}")
         return jsonify({'error': str(e)}), 500
@@ -77,10 +1103,23 @@ def sendMessage():
             return jsonify({'error': 'Missing required fields'}), 400
             
         conn, cursor = get_db()
-        cursor.execute("INSERT INTO rep_connect_messages (sender, sender_email, content) VALUES (%s, %s, %s)", 
+        cursor.execute("INSERT INTO rep_connect_messages (sender, sender_email, content) VALUES (%s, %s, %s) RETURNING id, timestamp, is_read", 
                       (name, email, message))
+        row = cursor.fetchone()
+        group = store_message_signature(cursor, row['id'], message)
+        add_to_message_group(cursor, group or row['id'], row['id'], row['timestamp'], row['is_read'])
+        notify_change(cursor, 'messages', 'created', {
+            'id': row['id'],
+            'group_id': group or row['id'],
+            'sender': name,
+            'email': email,
+            'message': message[:1000],
+            'truncated': len(message) > 1000,
+            'timestamp': row['timestamp'],
+            'is_read': row['is_read']
+        })
         conn.commit()
-        conn.close()
+        invalidate_message_stats()
         return jsonify({"status": "success"}), 200
     except Exception as e:
         print(f"Error sending message: {e}")
@@ -96,13 +1135,17 @@ def deleteMessage(message_id):
         message = cursor.fetchone()
         
         if not message:
-            conn.close()
             return jsonify({"error": "Message not found"}), 404
         
        
-        cursor.execute("DELETE FROM rep_connect_messages WHERE id = %s", (message_id,))
+        cursor.execute("""
+            DELETE FROM rep_connect_messages WHERE id = %s
+            RETURNING id, COALESCE(duplicate_group, id) AS group_id, is_read
+        """, (message_id,))
+        remove_from_message_groups(cursor, cursor.fetchall())
+        notify_ids(cursor, 'messages', 'deleted', [message_id])
         conn.commit()
-        conn.close()
+        invalidate_message_stats()
         
         return jsonify({"status": "success", "message": f"Message {message_id} deleted successfully"}), 200
     except Exception as e:
@@ -120,9 +1163,10 @@ def clearMessages():
         deleted_count = count_result["count"] if count_result else 0
         
         
-        cursor.execute("TRUNCATE TABLE rep_connect_messages")
+        cursor.execute("TRUNCATE TABLE rep_connect_messages, message_lsh_buckets, message_groups")
+        notify_change(cursor, 'messages', 'cleared', {})
         conn.commit()
-        conn.close()
+        invalidate_message_stats()
         
         return jsonify({
             "status": "success", 
@@ -148,14 +1192,17 @@ def updateMessageReadStatus(message_id):
         message = cursor.fetchone()
         
         if not message:
-            conn.close()
             return jsonify({"error": "Message not found"}), 404
         
        
-        cursor.execute("UPDATE rep_connect_messages SET is_read = %s WHERE id = %s", 
-                      (bool(data['is_read']), message_id))
+        cursor.execute("""
+            UPDATE rep_connect_messages SET is_read = %s WHERE id = %s AND is_read <> %s
+            RETURNING COALESCE(duplicate_group, id) AS group_id
+        """, (bool(data['is_read']), message_id, bool(data['is_read'])))
+        mark_message_groups_read(cursor, [row['group_id'] for row in cursor.fetchall()], bool(data['is_read']))
+        notify_ids(cursor, 'messages', 'read', [message_id], is_read=bool(data['is_read']))
         conn.commit()
-        conn.close()
+        invalidate_message_stats()
         
         return jsonify({
             "status": "success",
@@ -166,35 +1213,238 @@ def updateMessageReadStatus(message_id):
         print(f"Error updating message {message_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/messages/stats', methods=['GET'])
-def getMessageStats():
+def bulk_message_target(data, allow_all=False):
+    ids = data.get('ids')
+    message_filter = data.get('filter')
+    
+    if ids is not None:
+        if not isinstance(ids, list) or not ids:
+            raise ValueError("ids must be a non-empty list")
+        if len(ids) > CONFIG['bulk_max_ids']:
+            raise ValueError(f"At most {CONFIG['bulk_max_ids']} ids per request")
+        try:
+            ids = sorted({int(i) for i in ids})
+        except (TypeError, ValueError):
+            raise ValueError("ids must be integers")
+        return "id = ANY(%s)", [ids], ids
+    
+    if isinstance(message_filter, dict):
+        clauses, params = message_filters(message_filter)
+        if not clauses and not allow_all:
+            raise ValueError("filter must not be empty")
+        return " AND ".join(clauses) or "TRUE", params, None
+    
+    raise ValueError("Provide either ids or filter")
+
+def bulk_message_result(requested_ids, affected):
+    result = {
+        'status': 'success',
+        'count': len(affected),
+        'affected': sorted(affected)
+    }
+    if requested_ids is not None:
+        result['missing'] = sorted(set(requested_ids) - set(affected))
+    return result
+
+@app.route('/api/messages/read', methods=['PUT'])
+def bulkUpdateMessageReadStatus():
     try:
+        data = request.get_json(silent=True)
+        
+        if not data or 'is_read' not in data:
+            return jsonify({'error': 'Missing is_read field'}), 400
+        
+        try:
+            where, params, requested_ids = bulk_message_target(data, allow_all=True)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         conn, cursor = get_db()
+        # the CTE keeps each row's previous is_read so only real changes move the group counts
+        cursor.execute(f"""
+            WITH target AS (
+                SELECT id, is_read FROM rep_connect_messages WHERE {where} FOR UPDATE
+            )
+            UPDATE rep_connect_messages m SET is_read = %s
+            FROM target t
+            WHERE m.id = t.id
+            RETURNING m.id, COALESCE(m.duplicate_group, m.id) AS group_id, t.is_read AS was_read
+        """, params + [bool(data['is_read'])])
+        rows = cursor.fetchall()
+        affected = [row['id'] for row in rows]
+        mark_message_groups_read(cursor, [row['group_id'] for row in rows if row['was_read'] != bool(data['is_read'])],
+                                 bool(data['is_read']))
+        notify_ids(cursor, 'messages', 'read', affected, is_read=bool(data['is_read']))
+        conn.commit()
+        invalidate_message_stats()
         
-        # Total messages
-        cursor.execute("SELECT COUNT(*) as total FROM rep_connect_messages")
-        total = cursor.fetchone()["total"]
+        result = bulk_message_result(requested_ids, affected)
+        result['is_read'] = bool(data['is_read'])
+        return jsonify(result), 200
+    except Exception as e:
+        print(f"Error updating messages: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/messages', methods=['DELETE'])
+def bulkDeleteMessages():
+    try:
+        data = request.get_json(silent=True)
         
-       
-        cursor.execute("SELECT COUNT(*) as unread FROM rep_connect_messages WHERE is_read = FALSE OR is_read = 0")
-        unread = cursor.fetchone()["unread"]
+        if not data:
+            return jsonify({'error': 'Missing request body'}), 400
         
-       
-        cursor.execute("""
-            SELECT COUNT(*) as today 
-            FROM rep_connect_messages 
-            WHERE DATE(timestamp) = CURDATE()
-        """)
-        today = cursor.fetchone()["today"]
+        try:
+            where, params, requested_ids = bulk_message_target(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        conn.close()
+        conn, cursor = get_db()
+        cursor.execute(f"""
+            DELETE FROM rep_connect_messages WHERE {where}
+            RETURNING id, COALESCE(duplicate_group, id) AS group_id, is_read
+        """, params)
+        rows = cursor.fetchall()
+        affected = [row['id'] for row in rows]
+        remove_from_message_groups(cursor, rows)
+        notify_ids(cursor, 'messages', 'deleted', affected)
+        conn.commit()
+        invalidate_message_stats()
         
+        return jsonify(bulk_message_result(requested_ids, affected)), 200
+    except Exception as e:
+        print(f"Error deleting messages: {e}")
+        return jsonify({'error': str(e)}), 500
+
+SEARCH_HEADLINE_OPTIONS = 'MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<mark>, StopSel=</mark>'
+
+SEARCH_SCOPES = {
+    'messages': {
+        'table': 'rep_connect_messages',
+        'text': 'content',
+        'columns': 'd.id, d.sender, d.sender_email, d.timestamp, d.is_read',
+        'format': lambda r: {
+            'id': r['id'],
+            'sender': r['sender'],
+            'email': r['sender_email'],
+            'timestamp': r['timestamp'],
+            'is_read': r['is_read'],
+            'snippet': r['snippet'],
+            'rank': r['rank']
+        }
+    },
+    'responses': {
+        'table': 'poll_responses',
+        'text': 'text_response',
+        'columns': 'd.id, d.poll_id, d.category, d.created_at',
+        'format': lambda r: {
+            'id': r['id'],
+            'poll_id': r['poll_id'],
+            'category': r['category'],
+            'created_at': str(r['created_at']),
+            'snippet': r['snippet'],
+            'rank': r['rank']
+        }
+    }
+}
+
+@app.route('/api/search', methods=['GET'])
+@slow_handler
+def search():
+    try:
+        text = (request.args.get('q') or '').strip()
+        scope = request.args.get('scope', 'messages')
+        
+        if not text:
+            return jsonify({'error': 'q is required'}), 400
+        if scope not in SEARCH_SCOPES:
+            return jsonify({'error': f"scope must be one of {', '.join(SEARCH_SCOPES)}"}), 400
+        try:
+            limit = int(request.args.get('limit', CONFIG['search_page_size']))
+            limit = max(1, min(limit, CONFIG['search_max_page_size']))
+            offset = max(0, int(request.args.get('offset', 0)))
+            poll_id = request.args.get('poll_id')
+            poll_id = int(poll_id) if poll_id else None
+        except ValueError:
+            return jsonify({'error': 'limit, offset and poll_id must be integers'}), 400
+        
+        spec = SEARCH_SCOPES[scope]
+        extra = ""
+        params = [text]
+        if poll_id is not None and scope == 'responses':
+            extra = "AND poll_id = %s"
+            params.append(poll_id)
+        
+        # Rank and page on the GIN index first; headlines are only built for the rows on this page
+        conn, cursor = get_db()
+        cursor.execute(f"""
+            WITH q AS (SELECT websearch_to_tsquery('english', %s) AS query),
+            hits AS (
+                SELECT t.id, ts_rank_cd(t.search_vector, q.query) AS rank
+                FROM {spec['table']} t, q
+                WHERE t.search_vector @@ q.query {extra}
+                ORDER BY rank DESC, t.id DESC
+                LIMIT %s OFFSET %s
+            )
+            SELECT {spec['columns']}, hits.rank,
+                   ts_headline('english', d.{spec['text']}, q.query, %s) AS snippet
+            FROM hits
+            JOIN {spec['table']} d ON d.id = hits.id
+            CROSS JOIN q
+            ORDER BY hits.rank DESC, hits.id DESC
+        """, params + [limit + 1, offset, SEARCH_HEADLINE_OPTIONS])
+        rows = cursor.fetchall()
+        
+        has_more = len(rows) > limit
         return jsonify({
-            "total": total,
-            "unread": unread,
-            "today": today,
-            "read": total - unread
+            'scope': scope,
+            'results': [spec['format'](r) for r in rows[:limit]],
+            'next_offset': offset + limit if has_more else None
         }), 200
+    except Exception as e:
+        print(f"Error searching: {e}")
+        return jsonify({'error': str(e)}), 500
+
+_message_stats = {'value': None, 'expires': 0.0, 'generation': 0, 'hits': 0, 'misses': 0}
+_message_stats_lock = threading.Lock()
+
+def invalidate_message_stats():
+    with _message_stats_lock:
+        _message_stats['value'] = None
+        _message_stats['generation'] += 1
+
+@app.route('/api/messages/stats', methods=['GET'])
+def getMessageStats():
+    try:
+        with _message_stats_lock:
+            if _message_stats['value'] is not None and time.monotonic() < _message_stats['expires']:
+                _message_stats['hits'] += 1
+                return jsonify(_message_stats['value']), 200
+            _message_stats['misses'] += 1
+            generation = _message_stats['generation']
+        
+        conn, cursor = get_db()
+        cursor.execute("""
+            SELECT COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE NOT is_read) AS unread,
+                   COUNT(*) FILTER (WHERE timestamp >= CURRENT_DATE) AS today
+            FROM rep_connect_messages
+        """)
+        counts = cursor.fetchone()
+        
+        stats = {
+            "total": counts["total"],
+            "unread": counts["unread"],
+            "today": counts["today"],
+            "read": counts["total"] - counts["unread"]
+        }
+        
+        with _message_stats_lock:
+            # a write that landed while we were counting makes this result stale
+            if _message_stats['generation'] == generation:
+                _message_stats['value'] = stats
+                _message_stats['expires'] = time.monotonic() + CONFIG['message_stats_ttl']
+        
+        return jsonify(stats), 200
     except Exception as e:
         print(f"Error fetching stats: {e}")
         return jsonify({'error': str(e)}), 500
@@ -210,18 +1460,73 @@ def addEvent():
         event_time = request.form.get('event_time')
         event_desc = request.form.get('event_desc')
         conn, cursor = get_db()
-        cursor.execute("INSERT INTO events (event_name, event_date, event_time, event_desc) VALUES (%s,%s,%s,%s)", (event_name, event_date, event_time, event_desc))
+        cursor.execute("INSERT INTO events (event_name, event_date, event_time, event_desc) VALUES (%s,%s,%s,%s) RETURNING id", (event_name, event_date, event_time, event_desc))
+        event_id = cursor.fetchone()['id']
+        notify_change(cursor, 'events', 'created', {
+            'id': event_id,
+            'event_name': event_name,
+            'event_desc': event_desc,
+            'event_time': event_time,
+            'event_date': event_date
+        })
         conn.commit()
-        conn.close()
+        response_cache.bump('events')
         return jsonify({"status":"success"}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def event_range_filters(args):
+    clauses = []
+    params = []
+    
+    month = args.get('month')
+    if month:
+        try:
+            start = datetime.strptime(month, '%Y-%m').date()
+        except ValueError:
+            raise ValueError(f"Invalid month '{month}', expected YYYY-MM")
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        clauses.append("event_date >= %s AND event_date < %s")
+        params.extend([start, end])
+    
+    for name, op in (('from', '>='), ('to', '<=')):
+        value = args.get(name)
+        if value:
+            try:
+                params.append(date.fromisoformat(value))
+            except ValueError:
+                raise ValueError(f"Invalid {name} date '{value}', expected YYYY-MM-DD")
+            clauses.append(f"event_date {op} %s")
+    
+    if parse_bool_arg(args.get('upcoming')):
+        # same clock as the response cache key, so "upcoming" rolls over at midnight
+        clauses.append("event_date >= %s")
+        params.append(date.today())
+    
+    return clauses, params
+
 @app.route('/api/getEvent', methods=['GET', 'POST'])
+@cached_response('events', vary=date.today)
 def getEvent():
+    try:
+        clauses, params = event_range_filters(request.args)
+        limit = int(request.args.get('limit', CONFIG['events_limit']))
+        limit = max(1, min(limit, CONFIG['events_limit']))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
     conn, cursor = get_db()
-    cursor.execute("SELECT * FROM events")
+    cursor.execute(f"""
+        SELECT id, event_name, event_desc, event_time, event_date
+        FROM events
+        {where}
+        ORDER BY event_date, event_time, id
+        LIMIT %s
+    """, params + [limit + 1])
     events = cursor.fetchall()
+    truncated = len(events) > limit
+    events = events[:limit]
     evt_list = []
     for e in events:
         evt_list.append({
@@ -231,8 +1536,33 @@ def getEvent():
             'event_time': e['event_time'],
             'event_date': str(e['event_date'])
         })
-    conn.close()
-    return jsonify(evt_list)
+    response = jsonify(evt_list)
+    if truncated:
+        # narrow the range (month/from/to) to see the rest
+        response.headers['X-Events-Truncated'] = 'true'
+    return response
+
+@app.route('/api/eventCounts', methods=['GET'])
+@cached_response('events', vary=date.today)
+def getEventCounts():
+    try:
+        clauses, params = event_range_filters(request.args)
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn, cursor = get_db()
+        cursor.execute(f"""
+            SELECT event_date, COUNT(*) AS count
+            FROM events
+            {where}
+            GROUP BY event_date
+            ORDER BY event_date
+        """, params)
+        
+        return jsonify({str(row['event_date']): row['count'] for row in cursor.fetchall()}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/editEvent/<int:event_id>', methods=['PUT'])
 def editEvent(event_id):
@@ -244,7 +1574,6 @@ def editEvent(event_id):
         event = cursor.fetchone()
         
         if not event:
-            conn.close()
             return jsonify({'error': 'Event not found'}), 404
         
        
@@ -255,7 +1584,6 @@ def editEvent(event_id):
         
        
         if not event_name or not event_date:
-            conn.close()
             return jsonify({'error': 'Event name and date are required'}), 400
         
      
@@ -264,9 +1592,16 @@ def editEvent(event_id):
             SET event_name = %s, event_desc = %s, event_time = %s, event_date = %s 
             WHERE id = %s
         """, (event_name, event_desc, event_time, event_date, event_id))
+        notify_change(cursor, 'events', 'updated', {
+            'id': event_id,
+            'event_name': event_name,
+            'event_desc': event_desc,
+            'event_time': event_time,
+            'event_date': event_date
+        })
         
         conn.commit()
-        conn.close()
+        response_cache.bump('events')
         
         return jsonify({'status': 'success', 'message': 'Event updated successfully'}), 200
     
@@ -284,13 +1619,13 @@ def deleteEvent(event_id):
         event = cursor.fetchone()
         
         if not event:
-            conn.close()
             return jsonify({'error': 'Event not found'}), 404
         
       
         cursor.execute("DELETE FROM events WHERE id = %s", (event_id,))
+        notify_ids(cursor, 'events', 'deleted', [event_id])
         conn.commit()
-        conn.close()
+        response_cache.bump('events')
         
         return jsonify({'status': 'success', 'message': 'Event deleted successfully'}), 200
     
@@ -300,112 +1635,536 @@ def deleteEvent(event_id):
 
 
 
-HF_API_TOKEN = 'Removed for security reasons'  
+HF_API_TOKEN = os.environ.get('HF_API_TOKEN', '')
 HF_HEADERS = {"Authorization": f"Bearer {HF_API_TOKEN}"}
 
 
 ZERO_SHOT_URL = "https://api-inference.huggingface.co/models/facebook/bart-large-mnli"
 
-def simple_keyword_categorization(question, response, predefined_categories):
-    
-    try:
-       
-        response_clean = response.lower().strip()
-        
-       
-        corpus = [response_clean] + [cat.lower() for cat in predefined_categories]
-        
-       
-        vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
-        tfidf_matrix = vectorizer.fit_transform(corpus)
-        
-       
-        response_vec = tfidf_matrix[0:1]
-        category_vecs = tfidf_matrix[1:]
-        similarities = cosine_similarity(response_vec, category_vecs)[0]
-        
-       
-        best_idx = np.argmax(similarities)
-        
-       
-        if similarities[best_idx] < 0.1:
-            return "other"
-        
-        return predefined_categories[best_idx]
-        
-    except Exception as e:
-        print(f"Keyword categorization error: {str(e)}")
-        return "other"
+def import_ml_stack():
+    # numpy and sklearn take over a second to import, so they are imported where they are used;
+    # this pulls them in ahead of time, e.g. before forking workers
+    for module in ('numpy', 'sklearn.cluster', 'sklearn.feature_extraction.text'):
+        importlib.import_module(module)
 
-def generate_categories_from_question(question, num_categories=5):
-   
-    try:
-        question_lower = question.lower()
-        category_map = {
-            
-            'election': ['economy', 'healthcare', 'infrastructure', 'education', 'public safety', "foreign policy"],
-            'issue': ['infrastructure', 'healthcare', 'economy', 'education', 'environment'],
-            'problem': ['infrastructure', 'service quality', 'cost', 'accessibility', 'safety'],
-            'concern': ['safety', 'cost', 'quality', 'access', 'environment'],
-            
-            
-            'like': ['yes', 'no', 'maybe', 'depends'],
-            'prefer': ['option A', 'option B', 'option C', 'no preference'],
-            'favorite': ['first choice', 'second choice', 'third choice'],
-            'color': ['red', 'blue', 'green', 'yellow', 'orange'],
-            
-           
-            'improve': ['service', 'quality', 'speed', 'cost', 'communication'],
-            'change': ['process', 'policy', 'system', 'approach', 'communication'],
-            'better': ['quality', 'service', 'pricing', 'features', 'support'],
-            
-           
-            'think': ['positive', 'negative', 'neutral', 'mixed'],
-            'feel': ['satisfied', 'dissatisfied', 'neutral', 'mixed'],
-            'opinion': ['agree', 'disagree', 'neutral', 'unsure'],
-        }
-        
-       
-        for keyword, categories in category_map.items():
-            if keyword in question_lower:
-                result = categories[:num_categories-1]  
-                result.append('other')
-                return result
-        
-       
-        return ['response type 1', 'response type 2', 'response type 3', 'response type 4', 'other'][:num_categories]
-        
+
+# sklearn's ENGLISH_STOP_WORDS, copied so the pure-Python path matches TfidfVectorizer(stop_words='english')
+# without importing sklearn
+ENGLISH_STOP_WORDS = frozenset("""
+    a about above across after afterwards again against all almost alone along already also although
+    always am among amongst amoungst amount an and another any anyhow anyone anything anyway anywhere
+    are around as at back be became because become becomes becoming been before beforehand behind being
+    below beside besides between beyond bill both bottom but by call can cannot cant co con could
+    couldnt cry de describe detail do done down due during each eg eight either eleven else elsewhere
+    empty enough etc even ever every everyone everything everywhere except few fifteen fifty fill find
+    fire first five for former formerly forty found four from front full further get give go had has
+    hasnt have he hence her here hereafter hereby herein hereupon hers herself him himself his how
+    however hundred i ie if in inc indeed interest into is it its itself keep last latter latterly least
+    less ltd made many may me meanwhile might mill mine more moreover most mostly move much must my
+    myself name namely neither never nevertheless next nine no nobody none noone nor not nothing now
+    nowhere of off often on once one only onto or other others otherwise our ours ourselves out over own
+    part per perhaps please put rather re same see seem seemed seeming seems serious several she should
+    show side since sincere six sixty so some somehow someone something sometime sometimes somewhere
+    still such system take ten than that the their them themselves then thence there thereafter thereby
+    therefore therein thereupon these they thick thin third this those though three through throughout
+    thru thus to together too top toward towards twelve twenty two un under until up upon us very via
+    was we well were what whatever when whence whenever where whereafter whereas whereby wherein
+    whereupon wherever whether which while whither who whoever whole whom whose why will with within
+    without would yet you your yours yourself yourselves
+""".split())
+
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+def tfidf_terms(text):
+    # the same unigrams and bigrams TfidfVectorizer(stop_words='english', ngram_range=(1, 2)) produces
+    tokens = [t for t in TOKEN_PATTERN.findall(text) if t not in ENGLISH_STOP_WORDS]
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+def l2_normalize(weights):
+    norm = sum(w * w for w in weights.values()) ** 0.5
+    return {term: w / norm for term, w in weights.items()} if norm else {}
+
+
+class CategoryIndex:
+
+    def __init__(self, categories, min_similarity=0.1):
+        self.categories = list(categories)
+        self.min_similarity = min_similarity
+        
+        # TF-IDF with sklearn's smoothed idf, kept as dicts; cheap to build and exact for small lists
+        counts = [Counter(tfidf_terms(cat.lower())) for cat in self.categories]
+        df = Counter(term for c in counts for term in c)
+        n = len(self.categories)
+        self.idf = {term: math.log((1 + n) / (1 + d)) + 1 for term, d in df.items()}
+        self.vectors = [l2_normalize({t: tf * self.idf[t] for t, tf in c.items()}) for c in counts]
+        self._vectorizer = None
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def score(self, responses):
+        if not self.idf or not responses:
+            # empty when every category is a stop word; nothing can ever match
+            return ["other"] * len(responses)
+        if (len(self.categories) <= CONFIG['pure_cosine_max_categories']
+                and len(responses) <= CONFIG['pure_cosine_max_responses']):
+            return [self._score_one(r) for r in responses]
+        return self._score_matrix(responses)
+
+    def _score_one(self, response):
+        terms = Counter(t for t in tfidf_terms(response.lower().strip()) if t in self.idf)
+        vec = l2_normalize({t: tf * self.idf[t] for t, tf in terms.items()})
+        best_idx, best_sim = 0, 0.0
+        for idx, cat_vec in enumerate(self.vectors):
+            sim = sum(w * cat_vec.get(t, 0.0) for t, w in vec.items())
+            if sim > best_sim:
+                best_idx, best_sim = idx, sim
+        return self.categories[best_idx] if best_sim >= self.min_similarity else "other"
+
+    def _score_matrix(self, responses):
+        import numpy as np
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        with self._lock:
+            if self._vectorizer is None:
+                vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+                # rows come back L2-normalised, so a dot product is the cosine similarity
+                self._matrix = vectorizer.fit_transform([cat.lower() for cat in self.categories]).T.tocsc()
+                self._vectorizer = vectorizer
+        
+        response_vecs = self._vectorizer.transform([r.lower().strip() for r in responses])
+        similarities = (response_vecs @ self._matrix).toarray()
+        best_idx = similarities.argmax(axis=1)
+        best_sim = similarities[np.arange(len(responses)), best_idx]
+        
+        return [
+            self.categories[idx] if sim >= self.min_similarity else "other"
+            for idx, sim in zip(best_idx, best_sim)
+        ]
+
+
+class CategoryIndexCache:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, categories):
+        categories = list(categories)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None and index.categories == categories:
+                self._indexes.move_to_end(key)
+                self.hits += 1
+                return index
+            self.misses += 1
+        return self.build(key, categories)
+
+    def build(self, key, categories):
+        index = CategoryIndex(categories)
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.capacity:
+                self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, key):
+        with self._lock:
+            self._indexes.pop(key, None)
+
+
+category_indexes = CategoryIndexCache(CONFIG['category_index_cache_size'])
+
+def get_category_index(predefined_categories, poll_id=None):
+    key = poll_id if poll_id is not None else tuple(predefined_categories)
+    return category_indexes.get(key, predefined_categories)
+
+def simple_keyword_categorization(question, response, predefined_categories, poll_id=None):
+    return simple_keyword_categorization_batch([response], predefined_categories, poll_id)[0]
+
+def simple_keyword_categorization_batch(responses, predefined_categories, poll_id=None):
+    
+    try:
+        return get_category_index(predefined_categories, poll_id).score(list(responses))
+    except Exception as e:
+        print(f"Keyword categorization error: {str(e)}")
+        return ["other"] * len(responses)
+
+class CategoryMatcher:
+    # plain inflections of a keyword ("issues", "liked", "improvement") still count as a match
+    SUFFIXES = r'(?:s|es|d|ed|ing|ment|ments)?'
+    DEFAULT_FALLBACK = ['response type 1', 'response type 2', 'response type 3', 'response type 4', 'other']
+
+    def __init__(self, rules, fallback=None):
+        self.rules = rules
+        self.fallback = list(fallback or self.DEFAULT_FALLBACK)
+        self._rule_for_form = {}
+        for idx, rule in enumerate(rules):
+            for form in [rule['keyword']] + rule.get('aliases', []):
+                self._rule_for_form.setdefault(form.lower(), idx)
+        
+        # longest forms first so "preference" wins over "prefer"
+        forms = sorted(self._rule_for_form, key=len, reverse=True)
+        self.pattern = re.compile(r'\b(' + '|'.join(re.escape(f) for f in forms) + ')' + self.SUFFIXES + r'\b') if forms else None
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path) as f:
+                taxonomy = json.load(f)
+            return cls(taxonomy['rules'], taxonomy.get('fallback'))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load category taxonomy from {path}: {str(e)}")
+            return cls([])
+
+    def rank(self, question):
+        if self.pattern is None:
+            return []
+        scores = Counter(self._rule_for_form[m.group(1)] for m in self.pattern.finditer(question.lower()))
+        # most mentioned keyword first; ties keep taxonomy order
+        return sorted(scores, key=lambda idx: (-scores[idx], idx))
+
+    def suggest(self, question, num_categories=5):
+        ranked = self.rank(question)
+        categories = self.rules[ranked[0]]['categories'] if ranked else self.fallback
+        # 'other' always comes last, whatever the limit
+        result = [c for c in categories if c != 'other'][:num_categories-1]
+        result.append('other')
+        return result
+
+
+category_matcher = CategoryMatcher.from_file(CONFIG['category_taxonomy_path'])
+
+def generate_categories_from_question(question, num_categories=5):
+   
+    try:
+        return category_matcher.suggest(question, num_categories)
     except Exception as e:
         print(f"Category generation error: {str(e)}")
         return ['category 1', 'category 2', 'category 3', 'other']
 
-def categorize_response_to_options(response_text, category_options):
-    
-    
-    try:
+class ClassifierBackend:
+    name = None
+
+    def __init__(self):
+        self.calls = 0
+        self.items = 0
+        self.fallbacks = 0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+        self._lock = threading.Lock()
+
+    def classify(self, texts, labels, poll_id=None):
+        texts = list(texts)
+        start = time.perf_counter()
+        try:
+            return self._classify(texts, list(labels), poll_id)
+        finally:
+            latency = time.perf_counter() - start
+            classifier_latency.observe(latency, self.name)
+            if has_request_context() and 'request_start' in g:
+                g.classifier_time += latency
+            with self._lock:
+                self.calls += 1
+                self.items += len(texts)
+                self.total_latency += latency
+                self.last_latency = latency
+
+    def _classify(self, texts, labels, poll_id):
+        raise NotImplementedError
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.name,
+                'calls': self.calls,
+                'items': self.items,
+                'fallbacks': self.fallbacks,
+                'last_latency': self.last_latency,
+                'avg_latency': self.total_latency / self.calls if self.calls else 0.0
+            }
+
+
+class HuggingFaceBackend(ClassifierBackend):
+    name = 'huggingface'
+
+    def _classify(self, texts, labels, poll_id):
         payload = {
-            "inputs": response_text,
+            "inputs": texts,
             "parameters": {
-                "candidate_labels": category_options,
+                "candidate_labels": labels,
                 "multi_label": False
             }
         }
         
-        response = requests.post(ZERO_SHOT_URL, headers=HF_HEADERS, json=payload, timeout=5)
+        if not HF_API_TOKEN:
+            # every call would be rejected; don't pay for the round trips
+            return self._fallback(texts, labels, poll_id)
         
-        if response.status_code == 200:
-            result = response.json()
-            return result["labels"][0]
-    except Exception as e:
-        print(f"HF API failed, using fallback: {str(e)}")
+        delay = CONFIG['categorize_backoff']
+        for attempt in range(1, CONFIG['categorize_retries'] + 1):
+            try:
+                response = requests.post(ZERO_SHOT_URL, headers=HF_HEADERS, json=payload, timeout=5)
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    if isinstance(result, dict):
+                        result = [result]
+                    return [r["labels"][0] for r in result]
+                print(f"HF API returned {response.status_code} (attempt {attempt})")
+                if response.status_code != 429 and response.status_code < 500:
+                    # a bad token or request won't get better by asking again
+                    break
+            except (requests.Timeout, requests.ConnectionError) as e:
+                print(f"HF API failed (attempt {attempt}): {str(e)}")
+            except Exception as e:
+                print(f"HF API returned an unusable response: {str(e)}")
+                break
+            
+            if attempt < CONFIG['categorize_retries']:
+                time.sleep(delay)
+                delay *= 2
+        
+        print("HF API unavailable, using fallback")
+        return self._fallback(texts, labels, poll_id)
+
+    def _fallback(self, texts, labels, poll_id):
+        with self._lock:
+            self.fallbacks += 1
+        return simple_keyword_categorization_batch(texts, labels, poll_id)
+
+
+class TfidfBackend(ClassifierBackend):
+    name = 'tfidf'
+
+    def _classify(self, texts, labels, poll_id):
+        return simple_keyword_categorization_batch(texts, labels, poll_id)
+
+
+CLASSIFIER_BACKENDS = {
+    HuggingFaceBackend.name: HuggingFaceBackend,
+    TfidfBackend.name: TfidfBackend,
+}
+
+_classifiers = {}
+_classifier_lock = threading.Lock()
+
+def get_classifier(name=None):
+    name = name or CONFIG['classifier_backend']
+    if name not in CLASSIFIER_BACKENDS:
+        raise ValueError(f"Unknown classifier backend '{name}'")
+    
+    classifier = _classifiers.get(name)
+    if classifier is None:
+        with _classifier_lock:
+            classifier = _classifiers.get(name)
+            if classifier is None:
+                classifier = CLASSIFIER_BACKENDS[name]()
+                _classifiers[name] = classifier
+    return classifier
+
+def categorize_responses_to_options(response_texts, category_options, poll_id=None):
+    return get_classifier().classify(response_texts, category_options, poll_id)
+
+def categorize_response_to_options(response_text, category_options, poll_id=None):
+    return categorize_responses_to_options([response_text], category_options, poll_id)[0]
+
+
+PENDING_CATEGORY = 'pending'
+
+def increment_option_tallies(cursor, counts):
+    if counts:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO poll_option_tallies (poll_id, option_id, count)
+            VALUES %s
+            ON CONFLICT (poll_id, option_id)
+            DO UPDATE SET count = poll_option_tallies.count + EXCLUDED.count
+        """, [(poll_id, option_id, n) for (poll_id, option_id), n in counts.items()])
+
+def increment_category_tallies(cursor, counts):
+    counts = {key: n for key, n in counts.items() if n}
+    if counts:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO poll_category_tallies (poll_id, category, count)
+            VALUES %s
+            ON CONFLICT (poll_id, category)
+            DO UPDATE SET count = poll_category_tallies.count + EXCLUDED.count
+        """, [(poll_id, category, n) for (poll_id, category), n in counts.items()])
+
+def rebuild_tallies(cursor, poll_id=None):
+    # Keep concurrent votes from updating the tallies while they are recounted;
+    # they wait for our commit and then apply their increment on top.
+    cursor.execute("LOCK TABLE poll_option_tallies, poll_category_tallies IN EXCLUSIVE MODE")
     
+    poll_filter = "" if poll_id is None else "WHERE poll_id = %s"
+    params = () if poll_id is None else (poll_id,)
+    response_filter = "" if poll_id is None else "AND poll_id = %s"
     
-    return simple_keyword_categorization("", response_text, category_options)
+    cursor.execute(f"DELETE FROM poll_option_tallies {poll_filter}", params)
+    cursor.execute(f"DELETE FROM poll_category_tallies {poll_filter}", params)
+    cursor.execute(f"""
+        INSERT INTO poll_option_tallies (poll_id, option_id, count)
+        SELECT poll_id, selected_option_id, COUNT(*)
+        FROM poll_responses
+        WHERE selected_option_id IS NOT NULL {response_filter}
+        GROUP BY poll_id, selected_option_id
+    """, params)
+    cursor.execute(f"""
+        INSERT INTO poll_category_tallies (poll_id, category, count)
+        SELECT poll_id, category, COUNT(*)
+        FROM poll_responses
+        WHERE category IS NOT NULL {response_filter}
+        GROUP BY poll_id, category
+    """, params)
+
+_categorize_queue = queue.Queue()
+_categorize_workers = []
+_categorize_lock = threading.Lock()
+
+def enqueue_categorization(response_id, poll_id, text_response):
+    start_categorization_workers()
+    _categorize_queue.put((response_id, poll_id, text_response))
+
+def start_categorization_workers():
+    if _categorize_workers:
+        return
+    with _categorize_lock:
+        if _categorize_workers:
+            return
+        for i in range(CONFIG['categorize_workers']):
+            worker = threading.Thread(target=_categorization_worker, name=f"categorize-{i}", daemon=True)
+            worker.start()
+            _categorize_workers.append(worker)
+        threading.Thread(target=_recover_pending_forever, name="categorize-recover", daemon=True).start()
+
+def enqueue_pending_responses():
+    # Responses left pending by a crashed or restarted process. Each worker process runs this,
+    # so rows are claimed with a lease: only one process picks up a given row, and a row is
+    # only considered abandoned once it has been pending (or claimed) for a whole lease.
+    try:
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE poll_responses
+                    SET categorize_claimed_at = NOW()
+                    WHERE id IN (
+                        SELECT id FROM poll_responses
+                        WHERE category = %s
+                          AND COALESCE(categorize_claimed_at, created_at) < NOW() - make_interval(secs => %s)
+                        ORDER BY id
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, poll_id, text_response
+                """, (PENDING_CATEGORY, CONFIG['categorize_lease']))
+                rows = sorted(cursor.fetchall())
+            conn.commit()
+        for row in rows:
+            _categorize_queue.put(tuple(row))
+        if rows:
+            print(f"Re-queued {len(rows)} pending responses for categorization")
+    except Exception as e:
+        print(f"Error re-queueing pending responses: {str(e)}")
+
+def _recover_pending_forever():
+    while True:
+        enqueue_pending_responses()
+        time.sleep(CONFIG['categorize_lease'])
+
+def _next_categorization_batch():
+    batch = [_categorize_queue.get()]
+    deadline = time.monotonic() + CONFIG['categorize_batch_wait']
+    while len(batch) < CONFIG['categorize_batch_size']:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_categorize_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def _categorization_worker():
+    delay = CONFIG['categorize_backoff']
+    while True:
+        batch = _next_categorization_batch()
+        try:
+            categorize_batch(batch)
+            delay = CONFIG['categorize_backoff']
+        except Exception as e:
+            # the rows are still pending; put them back rather than leave them until a restart
+            print(f"Categorization batch of {len(batch)} failed, retrying in {delay:.1f}s: {str(e)}")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+            for item in batch:
+                _categorize_queue.put(item)
+        finally:
+            for _ in batch:
+                _categorize_queue.task_done()
+
+def categorize_batch(batch):
+    by_poll = {}
+    for response_id, poll_id, text_response in batch:
+        by_poll.setdefault(poll_id, []).append((response_id, text_response))
+    
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT poll_id, option_text
+                FROM poll_options
+                WHERE poll_id = ANY(%s)
+                ORDER BY poll_id, option_order
+            """, (list(by_poll),))
+            options = {}
+            for poll_id, option_text in cursor.fetchall():
+                options.setdefault(poll_id, []).append(option_text)
+        conn.rollback()
+        
+        updates = []
+        for poll_id, responses in by_poll.items():
+            category_options = options.get(poll_id)
+            if category_options:
+                categories = categorize_responses_to_options([text for _, text in responses], category_options, poll_id)
+            else:
+                categories = ["other"] * len(responses)
+            updates.extend((response_id, category) for (response_id, _), category in zip(responses, categories))
+        
+        with conn.cursor() as cursor:
+            # only rows still pending are written, so a concurrent recategorization wins
+            updated = psycopg2.extras.execute_values(cursor, """
+                UPDATE poll_responses AS pr
+                SET category = v.category
+                FROM (VALUES %s) AS v(id, category, old_category)
+                WHERE pr.id = v.id AND pr.category = v.old_category
+                RETURNING pr.poll_id, pr.category
+            """, [(response_id, category, PENDING_CATEGORY) for response_id, category in updates], fetch=True)
+            
+            tallies = Counter()
+            for poll_id, category in updated:
+                tallies[(poll_id, PENDING_CATEGORY)] -= 1
+                tallies[(poll_id, category)] += 1
+            increment_category_tallies(cursor, tallies)
+            
+            for poll_id in {poll_id for poll_id, _ in updated}:
+                notify_change(cursor, 'polls', 'categorized', {
+                    'poll_id': poll_id,
+                    'tallies': {category: n for (p, category), n in tallies.items() if p == poll_id and n}
+                })
+        conn.commit()
+    return updates
 
 @app.route('/api/getPolls', methods=['GET'])
+@cached_response('polls')
 def getPolls():
     conn,cursor = get_db()
-    cursor.execute("SELECT * FROM polls WHERE is_active =%s", (True,))
+    cursor.execute("""
+        SELECT id, title, poll_type, created_at, expires_at
+        FROM polls
+        WHERE is_active AND (expires_at IS NULL OR expires_at > LOCALTIMESTAMP)
+        ORDER BY created_at DESC, id DESC
+    """)
     polls = cursor.fetchall()
     poll_list = []
     for poll in polls:
@@ -416,7 +2175,6 @@ def getPolls():
             'created_at': poll['created_at'],
             'expires_at':poll['expires_at']
         })
-    conn.close()
     return jsonify(poll_list)
 
 @app.route('/api/deletePoll/<int:poll_id>', methods=['DELETE'])
@@ -429,13 +2187,17 @@ def deletePoll(poll_id):
         poll = cursor.fetchone()
         
         if not poll:
-            conn.close()
             return jsonify({'error': 'Poll not found'}), 404
         
       
         cursor.execute("DELETE FROM polls WHERE id = %s", (poll_id,))
+        notify_ids(cursor, 'polls', 'deleted', [poll_id])
         conn.commit()
-        conn.close()
+        response_cache.bump('polls')
+        category_indexes.invalidate(poll_id)
+        invalidate_poll_meta(poll_id)
+        voter_registry.drop(poll_id)
+        poll_scheduler.cancel(poll_id)
         
         return jsonify({'status': 'success', 'message': 'Poll deleted successfully'}), 200
     
@@ -443,6 +2205,7 @@ def deletePoll(poll_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/getPollOptions/<int:poll_id>', methods=['GET'])
+@cached_response('polls')
 def getPollOptions(poll_id):
     try:
         conn, cursor = get_db()
@@ -451,7 +2214,6 @@ def getPollOptions(poll_id):
         poll = cursor.fetchone()
         
         if not poll:
-            conn.close()
             return jsonify({'error': 'Poll not found'}), 404
         
         poll_type = poll['poll_type']
@@ -465,7 +2227,6 @@ def getPollOptions(poll_id):
         """, (poll_id,))
         
         options = cursor.fetchall()
-        conn.close()
         
         option_list = []
         for opt in options:
@@ -493,7 +2254,6 @@ def expirePoll(poll_id):
         poll = cursor.fetchone()
         
         if not poll:
-            conn.close()
             return jsonify({'error': 'Poll not found'}), 404
         
        
@@ -501,19 +2261,251 @@ def expirePoll(poll_id):
         expires_at = data.get('expires_at')
         
         if not expires_at:
-            conn.close()
             return jsonify({'error': 'expires_at is required'}), 400
         
       
-        cursor.execute("UPDATE polls SET expires_at = %s WHERE id = %s", (expires_at, poll_id))
+        # the scheduler only ever closes a poll because its deadline passed, so moving the
+        # deadline into the future reopens it
+        cursor.execute(f"""
+            UPDATE polls SET expires_at = %s, is_active = is_active OR %s::timestamp > LOCALTIMESTAMP
+            WHERE id = %s RETURNING is_active, {SECONDS_LEFT} AS seconds_left
+        """, (expires_at, expires_at, poll_id))
+        updated = cursor.fetchone()
+        notify_change(cursor, 'polls', 'updated',
+                      {'id': poll_id, 'expires_at': expires_at, 'is_active': updated['is_active']})
         conn.commit()
-        conn.close()
+        response_cache.bump('polls')
+        invalidate_poll_meta(poll_id)
+        if updated['is_active']:
+            poll_scheduler.schedule(poll_id, deadline_from(updated['seconds_left']))
         
         return jsonify({'status': 'success', 'message': 'Poll expiration updated successfully'}), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Deadlines are measured against the database clock and turned into local epoch
+# seconds, so naive expires_at timestamps never have to be compared across time zones
+SECONDS_LEFT = "EXTRACT(EPOCH FROM (expires_at - LOCALTIMESTAMP))::float"
+
+def deadline_from(seconds_left):
+    return None if seconds_left is None else time.time() + seconds_left
+
+
+class PollExpiryScheduler:
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="poll-expiry", daemon=True)
+            self._thread.start()
+
+    def schedule(self, poll_id, deadline):
+        with self._cond:
+            if deadline is None:
+                self._deadlines.pop(poll_id, None)
+                return
+            self._deadlines[poll_id] = deadline
+            heapq.heappush(self._heap, (deadline, poll_id))
+            self._cond.notify()
+
+    def cancel(self, poll_id):
+        with self._cond:
+            # the heap entry is skipped once it no longer matches _deadlines
+            self._deadlines.pop(poll_id, None)
+
+    def _load(self):
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT id, {SECONDS_LEFT}
+                    FROM polls
+                    WHERE is_active AND expires_at IS NOT NULL
+                """)
+                rows = cursor.fetchall()
+            conn.rollback()
+        for poll_id, seconds_left in rows:
+            self.schedule(poll_id, deadline_from(seconds_left))
+        print(f"Scheduled expiry for {len(rows)} active polls")
+
+    def _next_due(self):
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline, poll_id = self._heap[0]
+                if self._deadlines.get(poll_id) != deadline:
+                    heapq.heappop(self._heap)
+                    continue
+                remaining = deadline - time.time()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                due = []
+                while self._heap and self._heap[0][0] <= time.time():
+                    deadline, poll_id = heapq.heappop(self._heap)
+                    if self._deadlines.get(poll_id) == deadline:
+                        del self._deadlines[poll_id]
+                        due.append(poll_id)
+                if due:
+                    return due
+
+    def _run(self):
+        while True:
+            try:
+                self._load()
+                break
+            except Exception as e:
+                print(f"Could not load poll deadlines, retrying: {str(e)}")
+                time.sleep(5)
+        while True:
+            due = self._next_due()
+            try:
+                self._expire(due)
+            except Exception as e:
+                print(f"Expiring polls {due} failed, retrying: {str(e)}")
+                for poll_id in due:
+                    self.schedule(poll_id, time.time() + 5)
+
+    def _expire(self, poll_ids):
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE polls SET is_active = FALSE
+                    WHERE id = ANY(%s) AND is_active AND expires_at <= LOCALTIMESTAMP
+                    RETURNING id
+                """, (poll_ids,))
+                expired = [row[0] for row in cursor.fetchall()]
+                if expired:
+                    notify_ids(cursor, 'polls', 'updated', expired, is_active=False)
+                
+                # deadlines moved by another worker since we scheduled them
+                leftover = sorted(set(poll_ids) - set(expired))
+                if leftover:
+                    cursor.execute(f"""
+                        SELECT id, {SECONDS_LEFT}
+                        FROM polls
+                        WHERE id = ANY(%s) AND is_active AND expires_at IS NOT NULL
+                    """, (leftover,))
+                    rescheduled = cursor.fetchall()
+                else:
+                    rescheduled = []
+            conn.commit()
+        
+        for poll_id in expired:
+            invalidate_poll_meta(poll_id)
+        if expired:
+            response_cache.bump('polls')
+            print(f"Expired polls {expired}")
+        for poll_id, seconds_left in rescheduled:
+            self.schedule(poll_id, deadline_from(seconds_left))
+
+
+poll_scheduler = PollExpiryScheduler()
+
+@app.before_request
+def start_background_threads():
+    # serve.py also calls this from post_fork, so a worker recovers pending
+    # categorizations at boot rather than on its first short-answer vote
+    poll_scheduler.start()
+    start_categorization_workers()
+    # poll metadata cached here is only evicted by other workers' writes through the listener
+    change_hub.start()
+
+POLL_TYPE_OPTIONS = {
+    'yes_no': ['Yes', 'No'],
+    'yes_no_maybe': ['Yes', 'No', 'Maybe']
+}
+
+def poll_option_texts(title, poll_type, options=None):
+    if options:
+        return list(options)
+    if poll_type in POLL_TYPE_OPTIONS:
+        return list(POLL_TYPE_OPTIONS[poll_type])
+    if poll_type == 'short_answer':
+        try:
+            categories = generate_categories_from_question(title, num_categories=6)
+            print(f"Generated categories for poll '{title}': {categories}")
+            return categories
+        except Exception as e:
+            print(f"Error generating categories: {str(e)}")
+            return ['other']
+    return []
+
+def create_polls(cursor, polls):
+    # One multi-row INSERT for the polls and one for all of their options
+    inserted = psycopg2.extras.execute_values(cursor,
+        f"INSERT INTO polls (title, poll_type, expires_at) VALUES %s RETURNING id, {SECONDS_LEFT} AS seconds_left",
+        [(p['title'], p['poll_type'], p.get('expires_at')) for p in polls],
+        fetch=True, page_size=1000)
+    
+    option_rows = []
+    created = []
+    for row, poll in zip(inserted, polls):
+        poll_id = row['id']
+        options = poll_option_texts(poll['title'], poll['poll_type'], poll.get('options'))
+        option_rows.extend((poll_id, text, idx) for idx, text in enumerate(options, start=1))
+        created.append(dict(poll, id=poll_id, options=options, deadline=deadline_from(row['seconds_left'])))
+    
+    if option_rows:
+        psycopg2.extras.execute_values(cursor,
+            "INSERT INTO poll_options (poll_id, option_text, option_order) VALUES %s",
+            option_rows, page_size=1000)
+    
+    if len(created) == 1:
+        poll = created[0]
+        notify_change(cursor, 'polls', 'created', {
+            'id': poll['id'],
+            'title': poll['title'],
+            'poll_type': poll['poll_type'],
+            'expires_at': poll.get('expires_at')
+        })
+    else:
+        # one notification per NOTIFY_MAX_IDS polls rather than one round trip per poll
+        notify_ids(cursor, 'polls', 'created', [poll['id'] for poll in created])
+    return created
+
+def after_polls_created(created):
+    for poll in created:
+        if poll['poll_type'] == 'short_answer':
+            category_indexes.build(poll['id'], poll['options'])
+        poll_scheduler.schedule(poll['id'], poll['deadline'])
+    response_cache.bump('polls')
+
+@app.route('/api/suggestCategories', methods=['POST'])
+@slow_handler
+def suggestCategories():
+    data = request.get_json(silent=True)
+    titles = data.get('titles') if data else None
+    
+    if not isinstance(titles, list) or not all(isinstance(t, str) for t in titles):
+        return jsonify({'error': 'titles must be a list of strings'}), 400
+    if len(titles) > CONFIG['bulk_max_titles']:
+        return jsonify({'error': f"At most {CONFIG['bulk_max_titles']} titles per request"}), 400
+    
+    try:
+        num_categories = int(data.get('num_categories', 6))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'num_categories must be an integer'}), 400
+    # at least one real category next to 'other'
+    if not 2 <= num_categories <= CONFIG['suggest_max_categories']:
+        return jsonify({'error': f"num_categories must be between 2 and {CONFIG['suggest_max_categories']}"}), 400
+    
+    return jsonify({
+        'suggestions': [
+            {'title': title, 'categories': generate_categories_from_question(title, num_categories)}
+            for title in titles
+        ]
+    }), 200
+
 @app.route('/api/addPolls', methods=['GET', 'POST'])
 def addPolls():
     try:
@@ -524,95 +2516,430 @@ def addPolls():
             expires_at = None
         
         conn, cursor = get_db()
+        created = create_polls(cursor, [{'title': title, 'poll_type': poll_type, 'expires_at': expires_at}])
+        conn.commit()
+        after_polls_created(created)
+        return jsonify({'status': 'success', 'poll_id': created[0]['id']}), 200
+    except Exception as e:
+        print(str(e))
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/bulkAddPolls', methods=['POST'])
+def bulkAddPolls():
+    try:
+        data = request.get_json(silent=True)
+        polls = data.get('polls') if data else None
+        
+        if not isinstance(polls, list) or not polls:
+            return jsonify({'error': 'polls must be a non-empty list'}), 400
+        if len(polls) > CONFIG['bulk_max_polls']:
+            return jsonify({'error': f"At most {CONFIG['bulk_max_polls']} polls per request"}), 400
+        
+        cleaned = []
+        for idx, poll in enumerate(polls):
+            if not isinstance(poll, dict) or not poll.get('title') or not poll.get('poll_type'):
+                return jsonify({'error': f"Poll {idx} needs a title and poll_type"}), 400
+            options = poll.get('options')
+            if options is not None and (not isinstance(options, list) or not all(isinstance(o, str) and o for o in options)):
+                return jsonify({'error': f"Poll {idx} options must be a list of strings"}), 400
+            cleaned.append({
+                'title': poll['title'],
+                'poll_type': poll['poll_type'],
+                'expires_at': poll.get('expires_at') or None,
+                'options': options
+            })
         
-     
-        cursor.execute("INSERT INTO polls (title, poll_type, expires_at) VALUES (%s, %s, %s) RETURNING id", 
-                      (title, poll_type, expires_at))
-        poll_id = cursor.fetchone()['id']
-        
-       
-        if poll_type == 'yes_no':
-            cursor.execute("INSERT INTO poll_options (poll_id, option_text, option_order) VALUES (%s, %s, %s)", 
-                          (poll_id, 'Yes', 1))
-            cursor.execute("INSERT INTO poll_options (poll_id, option_text, option_order) VALUES (%s, %s, %s)", 
-                          (poll_id, 'No', 2))
-        elif poll_type == 'yes_no_maybe':
-            cursor.execute("INSERT INTO poll_options (poll_id, option_text, option_order) VALUES (%s, %s, %s)", 
-                          (poll_id, 'Yes', 1))
-            cursor.execute("INSERT INTO poll_options (poll_id, option_text, option_order) VALUES (%s, %s, %s)", 
-                          (poll_id, 'No', 2))
-            cursor.execute("INSERT INTO poll_options (poll_id, option_text, option_order) VALUES (%s, %s, %s)", 
-                          (poll_id, 'Maybe', 3))
-        elif poll_type == 'short_answer':
-            try:
-                categories = generate_categories_from_question(title, num_categories=6)
-                for idx, category in enumerate(categories, start=1):
-                    cursor.execute(
-                        "INSERT INTO poll_options (poll_id, option_text, option_order) VALUES (%s, %s, %s)", 
-                        (poll_id, category, idx)
-                    )
-                print(f"Generated categories for poll '{title}': {categories}")
-            except Exception as e:
-                print(f"Error generating categories: {str(e)}")
-                cursor.execute("INSERT INTO poll_options (poll_id, option_text, option_order) VALUES (%s, %s, %s)", 
-                              (poll_id, 'other', 1))
-        
+        conn, cursor = get_db()
+        created = create_polls(cursor, cleaned)
         conn.commit()
-        conn.close()
-        return jsonify({'status': 'success', 'poll_id': poll_id}), 200
+        after_polls_created(created)
+        
+        return jsonify({
+            'status': 'success',
+            'polls': [{'id': p['id'], 'title': p['title'], 'options': p['options']} for p in created]
+        }), 200
     except Exception as e:
         print(str(e))
         return jsonify({'error': str(e)}), 500
 
 
+_poll_meta = {}
+_poll_meta_lock = threading.Lock()
+_poll_meta_stats = Counter()
+
+def get_poll_meta(poll_id):
+    now = time.monotonic()
+    # without the listener another worker's expirePoll or deletePoll never reaches us,
+    # so cached entries are only trusted briefly
+    ttl = CONFIG['poll_meta_cache_ttl'] if change_hub.connected else CONFIG['poll_meta_unlistened_ttl']
+    with _poll_meta_lock:
+        meta = _poll_meta.get(poll_id)
+        if meta is not None and now - meta['loaded'] < ttl:
+            _poll_meta_stats['hits'] += 1
+            return meta
+        _poll_meta_stats['misses'] += 1
+    
+    conn, cursor = get_db()
+    cursor.execute(f"SELECT poll_type, is_active, {SECONDS_LEFT} AS seconds_left FROM polls WHERE id = %s", (poll_id,))
+    poll = cursor.fetchone()
+    if not poll:
+        return None
+    cursor.execute("SELECT id FROM poll_options WHERE poll_id = %s", (poll_id,))
+    meta = {
+        'poll_type': poll['poll_type'],
+        'option_ids': {row['id'] for row in cursor.fetchall()},
+        'is_active': poll['is_active'],
+        'deadline': deadline_from(poll['seconds_left']),
+        'loaded': now
+    }
+    with _poll_meta_lock:
+        _poll_meta[poll_id] = meta
+    return meta
+
+def poll_is_open(meta):
+    return meta['is_active'] and (meta['deadline'] is None or meta['deadline'] > time.time())
+
+def invalidate_poll_meta(poll_id):
+    with _poll_meta_lock:
+        _poll_meta.pop(poll_id, None)
+
+def _invalidate_poll_meta_from_change(event):
+    if event.get('topic') == 'polls' and event.get('action') == 'resync':
+        with _poll_meta_lock:
+            _poll_meta.clear()
+    elif event.get('topic') == 'polls' and event.get('action') in ('updated', 'deleted'):
+        for poll_id in event['data'].get('ids') or [event['data'].get('id')]:
+            invalidate_poll_meta(poll_id)
+
+change_hub.add_listener(_invalidate_poll_meta_from_change)
+
+def voter_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class VoterRegistry:
+
+    def __init__(self):
+        self._voters = {}
+        self._lock = threading.Lock()
+
+    def _digest(self, key):
+        # 128 bits of the stored sha256 is plenty to tell voters apart and halves the memory
+        return bytes.fromhex(key[:32])
+
+    def _ensure(self, poll_id):
+        with self._lock:
+            if poll_id in self._voters:
+                return
+        # called from pollResponse: reuse the request's connection rather than checking out a
+        # second one, which a burst of first votes could exhaust the pool with
+        conn, cursor = get_db()
+        cursor.execute("""
+            SELECT voter_token FROM poll_responses
+            WHERE poll_id = %s AND voter_token IS NOT NULL
+        """, (poll_id,))
+        digests = {self._digest(row['voter_token']) for row in cursor}
+        with self._lock:
+            self._voters.setdefault(poll_id, set()).update(digests)
+
+    def admit(self, poll_id, key):
+        self._ensure(poll_id)
+        digest = self._digest(key)
+        with self._lock:
+            voters = self._voters[poll_id]
+            if digest in voters:
+                return False
+            voters.add(digest)
+            return True
+
+    def forget(self, poll_id, key):
+        with self._lock:
+            self._voters.get(poll_id, set()).discard(self._digest(key))
+
+    def drop(self, poll_id):
+        with self._lock:
+            self._voters.pop(poll_id, None)
+
+    def load_active_polls(self):
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT pr.poll_id, pr.voter_token
+                    FROM poll_responses pr
+                    JOIN polls p ON p.id = pr.poll_id
+                    WHERE p.is_active AND pr.voter_token IS NOT NULL
+                """)
+                voters = {}
+                for poll_id, key in cursor:
+                    voters.setdefault(poll_id, set()).add(self._digest(key))
+            conn.rollback()
+        with self._lock:
+            for poll_id, digests in voters.items():
+                self._voters.setdefault(poll_id, set()).update(digests)
+        return sum(len(d) for d in voters.values())
+
+
+voter_registry = VoterRegistry()
+
+def write_votes(conn, votes):
+    # plain tuple cursor; request handlers' cursors return dicts
+    with conn.cursor() as cursor:
+        return _write_votes(cursor, votes)
+
+def _write_votes(cursor, votes):
+    # a repeat vote that slipped past this process's registry (e.g. cast on another worker)
+    # is dropped by the unique index and simply not returned
+    rows = psycopg2.extras.execute_values(cursor, """
+        INSERT INTO poll_responses (poll_id, selected_option_id, text_response, category, voter_token)
+        VALUES %s
+        ON CONFLICT (poll_id, voter_token) WHERE voter_token IS NOT NULL DO NOTHING
+        RETURNING id, poll_id, selected_option_id, text_response, category
+    """, votes, fetch=True, page_size=1000)
+    
+    option_counts = Counter()
+    category_counts = Counter()
+    for response_id, poll_id, option_id, text_response, category in rows:
+        if option_id:
+            option_counts[(poll_id, option_id)] += 1
+        if category:
+            category_counts[(poll_id, category)] += 1
+    increment_option_tallies(cursor, option_counts)
+    increment_category_tallies(cursor, category_counts)
+    
+    for poll_id in sorted({row[1] for row in rows}):
+        notify_change(cursor, 'polls', 'responses', {
+            'poll_id': poll_id,
+            'count': sum(1 for row in rows if row[1] == poll_id),
+            'options': {option_id: n for (p, option_id), n in option_counts.items() if p == poll_id},
+            'categories': {category: n for (p, category), n in category_counts.items() if p == poll_id}
+        })
+    return rows
+
+def after_votes_written(rows):
+    for response_id, poll_id, option_id, text_response, category in rows:
+        if category == PENDING_CATEGORY:
+            enqueue_categorization(response_id, poll_id, text_response)
+
+
+class VoteBufferFull(Exception):
+    pass
+
+
+# Worth retrying the same batch later; anything else is a problem with a vote itself
+TRANSIENT_DB_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolExhausted)
+
+
+class VoteBuffer:
+
+    def __init__(self):
+        self._votes = []
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._dead_letter_lock = threading.Lock()
+        self.dead_lettered = 0
+
+    def add(self, vote):
+        with self._cond:
+            if len(self._votes) >= CONFIG['vote_buffer_max']:
+                raise VoteBufferFull("Vote buffer is full, try again shortly")
+            if not self._votes:
+                self._oldest = time.monotonic()
+            self._votes.append(vote)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vote-flusher", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+            if len(self._votes) >= CONFIG['vote_batch_max']:
+                self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._votes)
+
+    def _take(self):
+        with self._cond:
+            while True:
+                if self._votes:
+                    due = self._oldest + CONFIG['vote_flush_interval_ms'] / 1000.0
+                    remaining = due - time.monotonic()
+                    if self._stopping or remaining <= 0 or len(self._votes) >= CONFIG['vote_batch_max']:
+                        break
+                    self._cond.wait(remaining)
+                elif self._stopping:
+                    return None
+                else:
+                    self._cond.wait()
+            batch = self._votes[:CONFIG['vote_batch_max']]
+            del self._votes[:len(batch)]
+            self._oldest = time.monotonic() if self._votes else None
+            return batch
+
+    def _requeue(self, batch):
+        with self._cond:
+            self._votes[:0] = batch
+            self._oldest = time.monotonic()
+
+    def _run(self):
+        delay = 0.1
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            try:
+                try:
+                    self._write(batch)
+                except TRANSIENT_DB_ERRORS:
+                    raise
+                except Exception as e:
+                    # one bad vote must not hold back the rest of the batch
+                    print(f"Flushing {len(batch)} votes failed, writing them one at a time: {str(e)}")
+                    self._write_each(batch)
+                delay = 0.1
+            except Exception as e:
+                # these votes were already acknowledged, so keep them and retry
+                print(f"Flushing {len(batch)} votes failed, retrying: {str(e)}")
+                self._requeue(batch)
+                time.sleep(delay)
+                delay = min(delay * 2, 5)
+
+    def _write(self, batch):
+        with pooled_connection() as conn:
+            rows = write_votes(conn, batch)
+            conn.commit()
+        after_votes_written(rows)
+
+    def _write_each(self, batch):
+        written = []
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                for vote in batch:
+                    cursor.execute("SAVEPOINT vote")
+                    try:
+                        written.extend(_write_votes(cursor, [vote]))
+                    except TRANSIENT_DB_ERRORS:
+                        raise
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT vote")
+                        self._dead_letter(vote, e)
+                    else:
+                        cursor.execute("RELEASE SAVEPOINT vote")
+            conn.commit()
+        after_votes_written(written)
+
+    def _dead_letter(self, vote, error):
+        poll_id, option_id, text_response, category, voter_token = vote
+        record = {
+            'poll_id': poll_id,
+            'selected_option_id': option_id,
+            'text_response': text_response,
+            'category': category,
+            'voter_token': voter_token,
+            'error': str(error),
+            'failed_at': datetime.now().isoformat()
+        }
+        print(f"Vote for poll {poll_id} could not be written, moved to dead letters: {str(error)}")
+        with self._dead_letter_lock:
+            self.dead_lettered += 1
+            os.makedirs(os.path.dirname(CONFIG['vote_dead_letter_path']) or '.', exist_ok=True)
+            with open(CONFIG['vote_dead_letter_path'], 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+
+    def stop(self, timeout=30):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        remaining = self.pending()
+        if remaining:
+            print(f"{remaining} buffered votes could not be written before shutdown")
+
+
+vote_buffer = VoteBuffer()
+
 @app.route('/api/pollResponse/<int:poll_id>/', methods=['POST'])
+@slow_handler
 def pollResponse(poll_id):
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         selected_option_id = data.get('selected_option_id')
         text_response = data.get('text_response')
         
     
         if not selected_option_id and not text_response:
             return jsonify({'error': 'Must provide either selected_option_id or text_response'}), 400
+        if text_response is not None and not isinstance(text_response, str):
+            return jsonify({'error': 'text_response must be a string'}), 400
         
-        conn, cursor = get_db()
+        poll = get_poll_meta(poll_id)
+        if not poll:
+            return jsonify({'error': 'Poll not found'}), 404
+        if not poll_is_open(poll):
+            return jsonify({'error': 'Poll is closed'}), 410
+        
+        if selected_option_id:
+            try:
+                selected_option_id = int(selected_option_id)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'selected_option_id must be an integer'}), 400
+            if selected_option_id not in poll['option_ids']:
+                return jsonify({'error': 'Option does not belong to this poll'}), 400
+        else:
+            selected_option_id = None
         
         category = None
+        if text_response and poll['poll_type'] == 'short_answer':
+            category = PENDING_CATEGORY
         
-      
-        if text_response:
-            cursor.execute("SELECT title, poll_type FROM polls WHERE id = %s", (poll_id,))
-            poll = cursor.fetchone()
-            
-            if poll and poll['poll_type'] == 'short_answer':
-                try:
-                    cursor.execute("""
-                        SELECT option_text 
-                        FROM poll_options 
-                        WHERE poll_id = %s 
-                        ORDER BY option_order
-                    """, (poll_id,))
-                    
-                    category_options = [row['option_text'] for row in cursor.fetchall()]
-                    
-                    if category_options:
-                        category = categorize_response_to_options(text_response, category_options)
-                        print(f"Response '{text_response}' categorized as: {category}")
-                    else:
-                        category = "other"
-                    
-                except Exception as e:
-                    print(f"AI categorization error: {str(e)}")
-                    category = "other"
+        voter_token = data.get('voter_token') or request.headers.get('X-Voter-Token')
+        if not voter_token and CONFIG['require_voter_token']:
+            return jsonify({'error': 'voter_token is required'}), 400
         
-        cursor.execute("INSERT INTO poll_responses (poll_id, selected_option_id, text_response, category) VALUES (%s, %s, %s, %s)", 
-                      (poll_id, selected_option_id, text_response, category))
-        conn.commit()
-        conn.close()
+        key = voter_key(str(voter_token)) if voter_token else None
+        if key and not voter_registry.admit(poll_id, key):
+            return jsonify({'error': 'Already voted in this poll'}), 409
+        
+        vote = (poll_id, selected_option_id, text_response, category, key)
+        
+        try:
+            if CONFIG['vote_ingest_mode'] == 'buffered':
+                try:
+                    vote_buffer.add(vote)
+                except VoteBufferFull as e:
+                    if key:
+                        voter_registry.forget(poll_id, key)
+                    return jsonify({'error': str(e)}), 503
+                return jsonify({
+                    'status': 'accepted',
+                    'category': category
+                }), 202
+            
+            conn, cursor = get_db()
+            try:
+                rows = write_votes(conn, [vote])
+            except psycopg2.errors.ForeignKeyViolation:
+                # deleted in another worker after we cached its metadata
+                conn.rollback()
+                invalidate_poll_meta(poll_id)
+                if key:
+                    voter_registry.forget(poll_id, key)
+                return jsonify({'error': 'Poll not found'}), 404
+            conn.commit()
+        except Exception:
+            if key:
+                voter_registry.forget(poll_id, key)
+            raise
+        
+        if not rows:
+            return jsonify({'error': 'Already voted in this poll'}), 409
+        after_votes_written(rows)
         
         return jsonify({
             'status': 'success',
+            'response_id': rows[0][0],
             'category': category
         }), 200
         
@@ -620,15 +2947,251 @@ def pollResponse(poll_id):
         print(str(e))
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/pollResponse/<int:poll_id>/progress', methods=['GET'])
+def getCategorizationProgress(poll_id):
+    try:
+        conn, cursor = get_db()
+        cursor.execute("""
+            SELECT COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE category = %s) AS pending
+            FROM poll_responses
+            WHERE poll_id = %s AND text_response IS NOT NULL
+        """, (PENDING_CATEGORY, poll_id))
+        counts = cursor.fetchone()
+        
+        return jsonify({
+            'poll_id': poll_id,
+            'total': counts['total'],
+            'pending': counts['pending'],
+            'categorized': counts['total'] - counts['pending'],
+            'complete': counts['pending'] == 0,
+            'queue_depth': _categorize_queue.qsize()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/categorizeResponses/<int:poll_id>', methods=['POST'])
+@slow_handler
+def categorizeResponses(poll_id):
+    try:
+        data = request.get_json()
+        responses = data.get('responses') if data else None
+        
+        if not isinstance(responses, list):
+            return jsonify({'error': 'responses must be a list'}), 400
+        
+        conn, cursor = get_db()
+        cursor.execute("""
+            SELECT option_text 
+            FROM poll_options 
+            WHERE poll_id = %s 
+            ORDER BY option_order
+        """, (poll_id,))
+        category_options = [row['option_text'] for row in cursor.fetchall()]
+        
+        if not category_options:
+            return jsonify({'error': 'Poll has no options'}), 404
+        
+        categories = simple_keyword_categorization_batch([str(r) for r in responses], category_options, poll_id)
+        return jsonify({'poll_id': poll_id, 'categories': categories}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/classifierStats', methods=['GET'])
+def getClassifierStats():
+    return jsonify({
+        'active': CONFIG['classifier_backend'],
+        'backends': [classifier.stats() for classifier in _classifiers.values()]
+    }), 200
+
+@app.route('/api/pollResults/<int:poll_id>', methods=['GET'])
+def getPollResults(poll_id):
+    try:
+        conn, cursor = get_db()
+        
+        cursor.execute("SELECT title, poll_type FROM polls WHERE id = %s", (poll_id,))
+        poll = cursor.fetchone()
+        
+        if not poll:
+            return jsonify({'error': 'Poll not found'}), 404
+        
+        cursor.execute("""
+            SELECT po.id, po.option_text, po.option_order, COALESCE(t.count, 0) AS count
+            FROM poll_options po
+            LEFT JOIN poll_option_tallies t ON t.poll_id = po.poll_id AND t.option_id = po.id
+            WHERE po.poll_id = %s
+            ORDER BY po.option_order
+        """, (poll_id,))
+        options = [{
+            'id': opt['id'],
+            'text': opt['option_text'],
+            'order': opt['option_order'],
+            'count': opt['count']
+        } for opt in cursor.fetchall()]
+        
+        cursor.execute("""
+            SELECT category, count
+            FROM poll_category_tallies
+            WHERE poll_id = %s AND count > 0
+            ORDER BY count DESC, category
+        """, (poll_id,))
+        categories = {row['category']: row['count'] for row in cursor.fetchall()}
+        pending = categories.pop(PENDING_CATEGORY, 0)
+        
+        if poll['poll_type'] == 'short_answer':
+            total = sum(categories.values()) + pending
+        else:
+            total = sum(opt['count'] for opt in options)
+        
+        return jsonify({
+            'poll_id': poll_id,
+            'title': poll['title'],
+            'poll_type': poll['poll_type'],
+            'total': total,
+            'pending': pending,
+            'options': options,
+            'categories': [{'category': c, 'count': n} for c, n in categories.items()]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def format_poll_response(resp, poll_type):
+    if poll_type in ['yes_no', 'yes_no_maybe']:
+        if resp['selected_option_id'] is not None:
+            answer = resp['option_text'] if resp['option_text'] else f"Option {resp['selected_option_id']}"
+        else:
+            answer = "No selection"
+        
+        return {
+            'id': resp['id'],
+            'answer': answer,
+            'created_at': str(resp['created_at'])
+        }
+    
+    answer = resp['category'] if resp['category'] else "Uncategorized"
+    return {
+        'id': resp['id'],
+        'answer': answer, 
+        'text_response': resp['text_response'], 
+        'created_at': str(resp['created_at'])
+    }
+
+_cluster_cache = OrderedDict()
+_cluster_cache_lock = threading.Lock()
+_cluster_cache_stats = Counter()
+
+def cluster_responses(texts, k, top_terms):
+    import numpy as np
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    
+    vectorizer = TfidfVectorizer(
+        stop_words='english',
+        ngram_range=(1, 2),
+        min_df=2 if len(texts) >= 100 else 1,
+        max_df=0.9 if len(texts) >= 100 else 1.0,
+        max_features=20000,
+        sublinear_tf=True
+    )
+    try:
+        matrix = vectorizer.fit_transform(texts)
+    except ValueError:
+        # nothing but stop words
+        return []
+    
+    k = min(k, matrix.shape[0])
+    model = MiniBatchKMeans(n_clusters=k, batch_size=1024, n_init=3, random_state=0)
+    labels = model.fit_predict(matrix)
+    terms = vectorizer.get_feature_names_out()
+    sizes = np.bincount(labels, minlength=k)
+    
+    clusters = []
+    for idx in range(k):
+        if not sizes[idx]:
+            continue
+        top = [terms[i] for i in model.cluster_centers_[idx].argsort()[::-1][:top_terms]]
+        examples = [texts[i] for i in np.flatnonzero(labels == idx)[:3]]
+        clusters.append({
+            'size': int(sizes[idx]),
+            'terms': top,
+            'suggested_category': ' / '.join(top[:2]),
+            'examples': examples
+        })
+    clusters.sort(key=lambda c: -c['size'])
+    return clusters
+
+@app.route('/api/pollClusters/<int:poll_id>', methods=['GET'])
+@slow_handler
+def getPollClusters(poll_id):
+    try:
+        try:
+            k = max(2, min(int(request.args.get('k', 5)), 20))
+            top_terms = max(1, min(int(request.args.get('terms', 5)), 20))
+        except ValueError:
+            return jsonify({'error': 'k and terms must be integers'}), 400
+        
+        conn, cursor = get_db()
+        cursor.execute("SELECT poll_type FROM polls WHERE id = %s", (poll_id,))
+        poll = cursor.fetchone()
+        if not poll:
+            return jsonify({'error': 'Poll not found'}), 404
+        
+        # cheap fingerprint of the corpus; any new or deleted response changes it
+        cursor.execute("""
+            SELECT COUNT(*) AS total, MAX(id) AS max_id
+            FROM poll_responses
+            WHERE poll_id = %s AND text_response IS NOT NULL
+        """, (poll_id,))
+        corpus = cursor.fetchone()
+        
+        key = (poll_id, k, top_terms, corpus['total'], corpus['max_id'])
+        with _cluster_cache_lock:
+            result = _cluster_cache.get(key)
+            if result is not None:
+                _cluster_cache.move_to_end(key)
+                _cluster_cache_stats['hits'] += 1
+                return jsonify(result), 200
+            _cluster_cache_stats['misses'] += 1
+        
+        reader = conn.cursor(name=f"clusters_{uuid.uuid4().hex}")
+        reader.itersize = CONFIG['stream_itersize']
+        reader.execute("""
+            SELECT text_response
+            FROM poll_responses
+            WHERE poll_id = %s AND text_response IS NOT NULL
+            ORDER BY id DESC
+            LIMIT %s
+        """, (poll_id, CONFIG['cluster_max_responses']))
+        texts = [row[0] for row in reader]
+        reader.close()
+        
+        result = {
+            'poll_id': poll_id,
+            'responses': corpus['total'],
+            'clustered': len(texts),
+            'clusters': cluster_responses(texts, k, top_terms) if len(texts) >= 2 else []
+        }
+        
+        with _cluster_cache_lock:
+            _cluster_cache[key] = result
+            while len(_cluster_cache) > CONFIG['cluster_cache_size']:
+                _cluster_cache.popitem(last=False)
+        
+        return jsonify(result), 200
+    except Exception as e:
+        print(f"Error clustering poll {poll_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/getPollResponse/<int:poll_id>/', methods=['GET'])
 def getPollResponse(poll_id):
-    conn = None
-    cursor = None
-    
     try:
         if poll_id <= 0:
             return jsonify({"error": "Invalid poll ID"}), 400
         
+        fmt = request.args.get('format')
+        if fmt and fmt not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unsupported format '{fmt}'"}), 400
+        
         conn, cursor = get_db()
         
     
@@ -638,82 +3201,319 @@ def getPollResponse(poll_id):
         if not poll_result:
             return jsonify({"error": "Poll not found"}), 404
         
-       
-        if isinstance(poll_result, dict):
-            poll_type = poll_result['poll_type']
-        else:
-            poll_type = poll_result[0]
-        
-      
+        poll_type = poll_result['poll_type']
         
-       
-        cursor.execute("""
+        query = """
             SELECT pr.id, pr.selected_option_id, pr.text_response, pr.category, pr.created_at,
                    po.option_text
             FROM poll_responses pr
             LEFT JOIN poll_options po ON pr.selected_option_id = po.id
             WHERE pr.poll_id = %s
             ORDER BY pr.created_at DESC
-        """, (poll_id,))
-        
-        responses = cursor.fetchall()
-        
+        """
         
-        if not responses:
-            return jsonify([])  
-        
-        resp_list = []
-        for resp in responses:
-            if isinstance(resp, dict):
-                response_id = resp['id']
-                selected_option_id = resp['selected_option_id']
-                text_response = resp['text_response']
-                category = resp.get('category')
-                created_at = resp['created_at']
-                option_text = resp.get('option_text')
-            else:
-                response_id = resp[0]
-                selected_option_id = resp[1]
-                text_response = resp[2]
-                category = resp[3]
-                created_at = resp[4]
-                option_text = resp[5] if len(resp) > 5 else None
-            
-
-            
-          
+        if fmt:
             if poll_type in ['yes_no', 'yes_no_maybe']:
-                if selected_option_id is not None:
-                    answer = option_text if option_text else f"Option {selected_option_id}"
-                else:
-                    answer = "No selection"
-                
-                resp_list.append({
-                    'id': response_id,
-                    'answer': answer,
-                    'created_at': str(created_at)
-                })
-            else:  
-                answer = category if category else "Uncategorized"
-                
-                resp_list.append({
-                    'id': response_id,
-                    'answer': answer, 
-                    'text_response': text_response, 
-                    'created_at': str(created_at)
-                })
+                columns = ['id', 'answer', 'created_at']
+            else:
+                columns = ['id', 'answer', 'text_response', 'created_at']
+            return stream_rows(query, (poll_id,), columns,
+                               lambda resp: format_poll_response(resp, poll_type),
+                               fmt, f"poll_{poll_id}_responses")
         
+        cursor.execute(query, (poll_id,))
+        responses = cursor.fetchall()
         
-        return jsonify(resp_list)
+        return jsonify([format_poll_response(resp, poll_type) for resp in responses])
         
     except Exception as e:
         print(f"Error in getPollResponse: {str(e)}")
         return jsonify({"error": f"Database error: {str(e)}"}), 500
-        
-    finally:
-        if conn:
-            conn.close()
+
+
+def counter_lines(name, kind, help_text, samples):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{format_labels(labels)} {value}" for labels, value in samples)
+    return lines
+
+def cache_samples():
+    with response_cache._lock:
+        response = (response_cache.hits, response_cache.misses)
+    with category_indexes._lock:
+        indexes = (category_indexes.hits, category_indexes.misses)
+    with _message_stats_lock:
+        stats = (_message_stats['hits'], _message_stats['misses'])
+    with _poll_meta_lock:
+        meta = (_poll_meta_stats['hits'], _poll_meta_stats['misses'])
+    with _cluster_cache_lock:
+        clusters = (_cluster_cache_stats['hits'], _cluster_cache_stats['misses'])
+    return {
+        'response': response,
+        'category_index': indexes,
+        'message_stats': stats,
+        'poll_meta': meta,
+        'clusters': clusters
+    }
+
+@app.route('/metrics', methods=['GET'])
+def getMetrics():
+    with _request_metrics_lock:
+        statuses = sorted(request_statuses.items())
+        profiles = sorted(profiles_taken.items())
+    
+    lines = counter_lines('nextup_requests_total', 'counter', "Responses by route and status", [
+        ({'endpoint': endpoint, 'method': method, 'status': status}, count)
+        for (endpoint, method, status), count in statuses
+    ])
+    for histogram in (request_latency, request_db_queries, request_db_time, db_query_latency, classifier_latency):
+        lines.extend(histogram.render())
+    
+    backends = [classifier.stats() for classifier in list(_classifiers.values())]
+    lines.extend(counter_lines('nextup_classifier_items_total', 'counter', "Texts classified per backend",
+                               [({'backend': b['backend']}, b['items']) for b in backends]))
+    lines.extend(counter_lines('nextup_classifier_fallbacks_total', 'counter', "Batches that fell back to a local classifier",
+                               [({'backend': b['backend']}, b['fallbacks']) for b in backends]))
+    lines.extend(counter_lines('nextup_classifier_fallback_ratio', 'gauge', "Share of classifier calls that fell back",
+                               [({'backend': b['backend']}, b['fallbacks'] / b['calls'] if b['calls'] else 0.0) for b in backends]))
+    
+    caches = cache_samples()
+    lines.extend(counter_lines('nextup_cache_hits_total', 'counter', "Cache hits",
+                               [({'cache': name}, hits) for name, (hits, _) in caches.items()]))
+    lines.extend(counter_lines('nextup_cache_misses_total', 'counter', "Cache misses",
+                               [({'cache': name}, misses) for name, (_, misses) in caches.items()]))
+    lines.extend(counter_lines('nextup_cache_hit_ratio', 'gauge', "Cache hits over lookups",
+                               [({'cache': name}, hits / (hits + misses) if hits + misses else 0.0)
+                                for name, (hits, misses) in caches.items()]))
+    
+    if _pool is not None:
+        pool = _pool.stats()
+        lines.extend(counter_lines('nextup_pool_connections', 'gauge', "Database pool connections by state",
+                                   [({'state': state}, pool[state]) for state in ('in_use', 'idle', 'waiting')]))
+        lines.extend(counter_lines('nextup_pool_timeouts_total', 'counter', "Pool checkouts that timed out",
+                                   [({}, pool['timeouts'])]))
+    lines.extend(counter_lines('nextup_profiles_total', 'counter', "Sampled handler profiles",
+                               [({'endpoint': endpoint}, count) for endpoint, count in profiles]))
+    
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+@app.cli.command('rebuild-tallies')
+@click.option('--poll-id', type=int, default=None, help='Only rebuild this poll.')
+def rebuild_tallies_command(poll_id):
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            rebuild_tallies(cursor, poll_id)
+        conn.commit()
+    print(f"Rebuilt tallies for {'poll ' + str(poll_id) if poll_id else 'all polls'}")
+
+
+def load_job_checkpoint(conn, job_name):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT last_id, processed, finished_at FROM job_checkpoints WHERE job_name = %s", (job_name,))
+        row = cursor.fetchone()
+    conn.rollback()
+    return row
+
+def save_job_checkpoint(cursor, job_name, last_id, processed, finished=False):
+    cursor.execute("""
+        INSERT INTO job_checkpoints (job_name, last_id, processed, updated_at, finished_at)
+        VALUES (%s, %s, %s, NOW(), CASE WHEN %s THEN NOW() END)
+        ON CONFLICT (job_name)
+        DO UPDATE SET last_id = EXCLUDED.last_id,
+                      processed = EXCLUDED.processed,
+                      updated_at = EXCLUDED.updated_at,
+                      finished_at = EXCLUDED.finished_at
+    """, (job_name, last_id, processed, finished))
+
+@app.cli.command('recategorize')
+@click.option('--poll-id', type=int, default=None, help='Only recategorize this poll.')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+@click.option('--backend', default=None, help='Classifier backend (defaults to CONFIG classifier_backend).')
+@click.option('--restart', is_flag=True, help='Ignore any saved checkpoint and start from the beginning.')
+def recategorize_command(poll_id, batch_size, backend, restart):
+    job_name = f"recategorize:{poll_id if poll_id else 'all'}"
+    classifier = get_classifier(backend)
+    
+    poll_filter = "" if poll_id is None else "AND pr.poll_id = %s"
+    poll_params = () if poll_id is None else (poll_id,)
+    
+    with pooled_connection() as write_conn, pooled_connection() as read_conn:
+        checkpoint = None if restart else load_job_checkpoint(write_conn, job_name)
+        if checkpoint and checkpoint[2] is None:
+            last_id, processed = checkpoint[0], checkpoint[1]
+            print(f"Resuming {job_name} after response {last_id} ({processed} already done)")
+        else:
+            last_id, processed = 0, 0
+        
+        with write_conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT COUNT(*)
+                FROM poll_responses pr
+                JOIN polls p ON p.id = pr.poll_id
+                WHERE p.poll_type = 'short_answer' AND pr.text_response IS NOT NULL
+                  AND pr.id > %s {poll_filter}
+            """, (last_id,) + poll_params)
+            remaining = cursor.fetchone()[0]
+        write_conn.rollback()
+        print(f"{remaining} responses to recategorize with the {classifier.name} backend")
+        
+        # server-side cursor: only one batch of rows is held in memory at a time
+        reader = read_conn.cursor(name=f"recategorize_{uuid.uuid4().hex}")
+        reader.itersize = batch_size
+        reader.execute(f"""
+            SELECT pr.id, pr.poll_id, pr.text_response
+            FROM poll_responses pr
+            JOIN polls p ON p.id = pr.poll_id
+            WHERE p.poll_type = 'short_answer' AND pr.text_response IS NOT NULL
+              AND pr.id > %s {poll_filter}
+            ORDER BY pr.id
+        """, (last_id,) + poll_params)
+        
+        options = {}
+        changed_polls = set()
+        done = 0
+        started = time.monotonic()
+        try:
+            while True:
+                rows = reader.fetchmany(batch_size)
+                if not rows:
+                    break
+                
+                by_poll = {}
+                for response_id, row_poll_id, text_response in rows:
+                    by_poll.setdefault(row_poll_id, []).append((response_id, text_response))
+                
+                with write_conn.cursor() as cursor:
+                    missing = [p for p in by_poll if p not in options]
+                    if missing:
+                        cursor.execute("""
+                            SELECT poll_id, option_text FROM poll_options
+                            WHERE poll_id = ANY(%s)
+                            ORDER BY poll_id, option_order
+                        """, (missing,))
+                        for p in missing:
+                            options[p] = []
+                        for p, option_text in cursor.fetchall():
+                            options[p].append(option_text)
+                    
+                    new_categories = {}
+                    for p, responses in by_poll.items():
+                        if options[p]:
+                            categories = classifier.classify([text for _, text in responses], options[p], p)
+                        else:
+                            categories = ["other"] * len(responses)
+                        new_categories.update((response_id, category) for (response_id, _), category in zip(responses, categories))
+                    
+                    # lock the rows so the tally deltas below match what we overwrite, even if a
+                    # categorization worker is finishing one of them right now
+                    cursor.execute("""
+                        SELECT id, poll_id, category FROM poll_responses
+                        WHERE id = ANY(%s)
+                        FOR UPDATE
+                    """, (list(new_categories),))
+                    tallies = Counter()
+                    updated = []
+                    for response_id, row_poll_id, old_category in cursor.fetchall():
+                        category = new_categories[response_id]
+                        if category == old_category:
+                            continue
+                        updated.append((response_id, category))
+                        if old_category:
+                            tallies[(row_poll_id, old_category)] -= 1
+                        tallies[(row_poll_id, category)] += 1
+                        changed_polls.add(row_poll_id)
+                    
+                    if updated:
+                        psycopg2.extras.execute_values(cursor, """
+                            UPDATE poll_responses AS pr
+                            SET category = v.category
+                            FROM (VALUES %s) AS v(id, category)
+                            WHERE pr.id = v.id
+                        """, updated, page_size=batch_size)
+                    # tallies move in the same transaction as the rows, so results stay right
+                    # mid-run and after an interrupted run
+                    increment_category_tallies(cursor, tallies)
+                    
+                    last_id = rows[-1][0]
+                    processed += len(rows)
+                    save_job_checkpoint(cursor, job_name, last_id, processed)
+                write_conn.commit()
+                
+                done += len(rows)
+                elapsed = time.monotonic() - started
+                print(f"  {done}/{remaining} ({done / elapsed:.0f}/s), {len(updated)} changed in this batch, checkpoint at id {last_id}")
+        except KeyboardInterrupt:
+            print(f"Interrupted; run again to resume after response {last_id}")
+            raise SystemExit(1)
+        finally:
+            reader.close()
+        
+        with write_conn.cursor() as cursor:
+            save_job_checkpoint(cursor, job_name, last_id, processed, finished=True)
+        write_conn.commit()
+    
+    print(f"Recategorized {done} responses; categories changed in {len(changed_polls)} polls")
+
+
+@app.cli.command('dedupe-messages')
+@click.option('--batch-size', type=int, default=500, show_default=True)
+def dedupe_messages_command(batch_size):
+    # Backfills signatures for messages stored before duplicate detection existed,
+    # then recounts the group summaries
+    done = 0
+    with pooled_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            while True:
+                cursor.execute("""
+                    SELECT id, content FROM rep_connect_messages
+                    WHERE minhash IS NULL
+                    ORDER BY id
+                    LIMIT %s
+                """, (batch_size,))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    store_message_signature(cursor, row['id'], row['content'])
+                conn.commit()
+                done += len(rows)
+                print(f"  {done} messages signed")
+            # buckets of messages that joined a group are never looked up
+            cursor.execute("""
+                DELETE FROM message_lsh_buckets b
+                USING rep_connect_messages m
+                WHERE m.id = b.message_id AND m.duplicate_group IS NOT NULL
+            """)
+            pruned = cursor.rowcount
+            rebuild_message_groups(cursor)
+            conn.commit()
+    print(f"Computed duplicate signatures for {done} messages; pruned {pruned} buckets of grouped copies")
+
+
+def warm_up():
+    """Imports the ML stack and builds the classifier once so a fresh worker's first request doesn't pay for it."""
+    import_ml_stack()
+    classifier = get_classifier()
+    CategoryIndex(['warm up', 'other'])._score_matrix(['warm up'])
+    if not isinstance(classifier, HuggingFaceBackend):
+        classifier._classify(['warm up'], ['warm up', 'other'], None)
+    return classifier
+
+def reset_after_fork():
+    # Threads and connections don't survive fork; a child starts its own on first use
+    global _pool
+    _pool = None
+    change_hub._thread = None
+    change_hub._subscribers.clear()
+    _categorize_workers.clear()
+    vote_buffer._thread = None
+    poll_scheduler._thread = None
 
 
 if __name__ == '__main__':
+    try:
+        print(f"Loaded {voter_registry.load_active_polls()} voter tokens for active polls")
+    except Exception as e:
+        # polls are also loaded one at a time on their first vote
+        print(f"Could not preload voter tokens: {str(e)}")
     app.run(debug=True, port=8000)
\ No newline at end of file
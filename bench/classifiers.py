@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+FIXTURE = os.path.join(BENCH, 'classifier_fixture.json')
+# Different wording from the first fixture, plus custom label sets that are not in categories.json
+HELDOUT = os.path.join(BENCH, 'classifier_heldout.json')
+
+
+def load_fixture(path):
+    with open(path) as f:
+        fixture = json.load(f)
+
+    groups = {}
+    for example in fixture['examples']:
+        groups.setdefault(example['label_set'], []).append(example)
+    return fixture['label_sets'], groups
+
+
+def run_backend(name, fixture, label_sets, groups, repeat):
+    classifier = app.CLASSIFIER_BACKENDS[name]()
+
+    # warm up so one-time setup (vectorizers, label matrices) is not counted
+    for label_set, examples in groups.items():
+        classifier.classify([examples[0]['text']], label_sets[label_set])
+
+    correct = 0
+    total = 0
+    elapsed = 0.0
+    latencies = []
+    for _ in range(repeat):
+        for label_set, examples in groups.items():
+            texts = [e['text'] for e in examples]
+            start = time.perf_counter()
+            predicted = classifier.classify(texts, label_sets[label_set])
+            latency = time.perf_counter() - start
+            elapsed += latency
+            latencies.append(latency)
+            correct += sum(p == e['label'] for p, e in zip(predicted, examples))
+            total += len(examples)
+
+    return {
+        'fixture': os.path.basename(fixture),
+        'backend': name,
+        'accuracy': correct / total if total else 0.0,
+        'items': total,
+        'throughput': total / elapsed if elapsed else 0.0,
+        'mean_batch_latency_ms': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+        'fallbacks': classifier.fallbacks
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare classifier backends on a labeled fixture")
+    parser.add_argument('--fixture', action='append', default=None,
+                        help="fixture file, may be repeated (default: the tuning and held-out fixtures)")
+    parser.add_argument('--backends', default=None, help="comma separated backend names")
+    parser.add_argument('--remote', action='store_true', help="include the HuggingFace backend (needs network and HF_API_TOKEN)")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', dest='json_out', default=None, help="write results to this file")
+    args = parser.parse_args()
+
+    if args.backends:
+        names = args.backends.split(',')
+    else:
+        names = [name for name in app.CLASSIFIER_BACKENDS if args.remote or name != app.HuggingFaceBackend.name]
+
+    repeat = args.repeat if app.HuggingFaceBackend.name not in names else 1
+    results = []
+    for fixture in args.fixture or [FIXTURE, HELDOUT]:
+        label_sets, groups = load_fixture(fixture)
+        fixture_results = [run_backend(name, fixture, label_sets, groups, repeat) for name in names]
+        results.extend(fixture_results)
+
+        print(os.path.basename(fixture))
+        print(f"{'backend':<14}{'accuracy':>10}{'items/s':>12}{'batch ms':>12}{'fallbacks':>11}")
+        for r in fixture_results:
+            print(f"{r['backend']:<14}{r['accuracy']:>10.1%}{r['throughput']:>12.0f}{r['mean_batch_latency_ms']:>12.2f}{r['fallbacks']:>11}")
+        print()
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH))
+
+ML_MODULES = ('numpy', 'scipy', 'sklearn')
+RESULT_MARKER = 'IMPORT_TIME_RESULT '
+
+# Each scenario runs in a fresh interpreter, so nothing an earlier one imported is counted
+SCENARIOS = {
+    'messages': [('GET', '/api/messages?limit=50'), ('GET', '/api/messages/stats')],
+    'calendar': [('GET', '/api/getEvent?upcoming=true'), ('GET', '/api/eventCounts')],
+    'short_answer_small': 'classify',
+    'warm_up': 'warm_up'
+}
+
+
+def child(scenario, settings):
+    started = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+    app.CONFIG.update(settings)
+
+    statuses = []
+    work = SCENARIOS[scenario]
+    if work == 'classify':
+        app.CONFIG['classifier_backend'] = 'tfidf'
+        app.categorize_responses_to_options(["Fix the potholes on Main Street"],
+                                            ['infrastructure', 'education', 'public safety', 'other'])
+    elif work == 'warm_up':
+        app.warm_up()
+    else:
+        client = app.app.test_client()
+        for method, path in work:
+            statuses.append(client.open(path, method=method).status_code)
+    finished = time.perf_counter()
+
+    print(RESULT_MARKER + json.dumps({
+        'import_ms': 1000 * (imported - started),
+        'first_requests_ms': 1000 * (finished - imported),
+        'ml_loaded': sorted(m for m in ML_MODULES if m in sys.modules),
+        'statuses': statuses
+    }), flush=True)
+
+
+def measure(scenario, settings, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', scenario, json.dumps(settings)],
+                             capture_output=True, text=True, check=True).stdout
+        # the app and its background threads print to stdout too
+        line = next(line for line in out.splitlines() if line.startswith(RESULT_MARKER))
+        runs.append(json.loads(line[len(RESULT_MARKER):]))
+    return {
+        'scenario': scenario,
+        'import_ms': statistics.median(r['import_ms'] for r in runs),
+        'first_requests_ms': statistics.median(r['first_requests_ms'] for r in runs),
+        'ml_loaded': runs[-1]['ml_loaded'],
+        'statuses': runs[-1]['statuses']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start per endpoint and whether it pulls in numpy/sklearn")
+    parser.add_argument('--dsn', default=None, help="scratch database to serve from; without it requests fail after the DB connect")
+    parser.add_argument('--initdb', action='store_true', help="create a temporary cluster with initdb/pg_ctl")
+    parser.add_argument('--pg-bin', default=None)
+    parser.add_argument('--scenarios', default=None, help="comma separated scenario names (default: all)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', dest='json_out', default=None, help="write results to this file")
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], json.loads(args.child[1]))
+        return
+
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    cluster = None
+    settings = {}
+    try:
+        if args.initdb or args.dsn:
+            from loadtest import TempCluster, dsn_settings, prepare_database
+            cluster = TempCluster(args.pg_bin) if args.initdb else None
+            settings = cluster.start() if cluster else dsn_settings(args.dsn)
+            prepare_database(settings, messages=1000, events=100)
+        else:
+            print("No database given: requests stop at the connection error, but imports are still measured\n")
+
+        results = [measure(name, settings, args.repeat) for name in names]
+    finally:
+        if cluster:
+            cluster.stop()
+
+    print(f"{'scenario':<22}{'import ms':>11}{'first ms':>11}  {'ML modules loaded':<22}statuses")
+    for r in results:
+        print(f"{r['scenario']:<22}{r['import_ms']:>11.0f}{r['first_requests_ms']:>11.0f}  "
+              f"{', '.join(r['ml_loaded']) or 'none':<22}{r['statuses']}")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
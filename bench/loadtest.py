@@ -0,0 +1,446 @@
+import argparse
+import glob
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+import requests
+from werkzeug.serving import make_server
+
+import app
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA = os.path.join(ROOT, 'db.sql')
+BENCH_USER = 'nextup_bench'
+BENCH_DATABASE = 'nextup_bench'
+
+TOPICS = ['parks', 'transit', 'housing', 'schools', 'safety', 'libraries', 'jobs', 'climate']
+ANSWERS = [
+    "More buses and safer bike lanes downtown",
+    "Fix the potholes on the main roads",
+    "Keep the library open later on weekends",
+    "Affordable apartments for young families",
+    "Better mental health support in schools",
+    "Plant more trees and build community gardens",
+    "Summer jobs for high school students",
+    "More police patrols near the park at night"
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def find_pg_binary(name, pg_bin=None):
+    if pg_bin:
+        return os.path.join(pg_bin, name)
+    found = shutil.which(name)
+    if found:
+        return found
+    # Debian/Ubuntu keep the server binaries off PATH
+    candidates = sorted(glob.glob(f'/usr/lib/postgresql/*/bin/{name}'))
+    if candidates:
+        return candidates[-1]
+    raise SystemExit(f"Could not find {name}; pass --pg-bin or use --dsn with an existing database")
+
+
+class TempCluster:
+    """A throwaway Postgres cluster in a temp directory, reachable only over a unix socket."""
+
+    def __init__(self, pg_bin=None):
+        self.initdb = find_pg_binary('initdb', pg_bin)
+        self.pg_ctl = find_pg_binary('pg_ctl', pg_bin)
+        self.dir = None
+        self.port = None
+
+    @property
+    def data_dir(self):
+        return os.path.join(self.dir, 'data')
+
+    def start(self):
+        self.dir = tempfile.mkdtemp(prefix='nextup-bench-')
+        self.port = free_port()
+        subprocess.run([self.initdb, '-D', self.data_dir, '-U', BENCH_USER, '--auth=trust', '-E', 'UTF8'],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([self.pg_ctl, '-D', self.data_dir, '-l', os.path.join(self.dir, 'postgres.log'), '-w',
+                        '-o', f"-p {self.port} -k {self.dir} -c listen_addresses='' -c max_connections=200",
+                        'start'], check=True, stdout=subprocess.DEVNULL)
+
+        conn = psycopg2.connect(dbname='postgres', user=BENCH_USER, host=self.dir, port=self.port)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE {BENCH_DATABASE}")
+        conn.close()
+        return {'host': self.dir, 'port': self.port, 'user': BENCH_USER, 'database': BENCH_DATABASE}
+
+    def stop(self):
+        if self.dir is None:
+            return
+        subprocess.run([self.pg_ctl, '-D', self.data_dir, '-m', 'fast', '-w', 'stop'],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.dir = None
+
+
+def dsn_settings(dsn):
+    parsed = psycopg2.extensions.parse_dsn(dsn)
+    return {
+        'host': parsed.get('host', app.CONFIG['host']),
+        'port': int(parsed.get('port', app.CONFIG['port'])),
+        'user': parsed.get('user', app.CONFIG['user']),
+        'database': parsed.get('dbname', app.CONFIG['database'])
+    }
+
+
+def connect(settings):
+    return psycopg2.connect(dbname=settings['database'], user=settings['user'],
+                            host=settings['host'], port=settings['port'])
+
+
+def prepare_database(settings, messages, events):
+    conn = connect(settings)
+    with conn.cursor() as cursor:
+        with open(SCHEMA) as f:
+            cursor.execute(f.read())
+        cursor.execute("""
+            TRUNCATE polls, rep_connect_messages, message_lsh_buckets, message_groups, events, job_checkpoints
+            RESTART IDENTITY CASCADE
+        """)
+        cursor.execute("""
+            INSERT INTO rep_connect_messages (sender, sender_email, content, timestamp, is_read)
+            SELECT 'Resident ' || (i %% 500),
+                   'resident' || (i %% 500) || '@example.org',
+                   'Message ' || i || ' about ' || (%s::text[])[1 + i %% %s],
+                   NOW() - make_interval(secs => i * 30),
+                   i %% 3 = 0
+            FROM generate_series(1, %s) AS i
+        """, (TOPICS, len(TOPICS), messages))
+        app.rebuild_message_groups(cursor)
+        cursor.execute("""
+            INSERT INTO events (event_name, event_date, event_time, event_desc)
+            SELECT 'Town hall ' || i,
+                   CURRENT_DATE + (i %% 730 - 365),
+                   (9 + i %% 10) || ':00',
+                   'Discussion of ' || (%s::text[])[1 + i %% %s]
+            FROM generate_series(1, %s) AS i
+        """, (TOPICS, len(TOPICS), events))
+        cursor.execute("ANALYZE")
+        cursor.execute("SELECT current_setting('server_version')")
+        version = cursor.fetchone()[0]
+    conn.commit()
+    conn.close()
+    return version
+
+
+def pending_categorizations(settings, poll_id):
+    conn = connect(settings)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM poll_responses WHERE poll_id = %s AND category = %s",
+                           (poll_id, app.PENDING_CATEGORY))
+            return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+class StubZeroShot(BaseHTTPRequestHandler):
+    """Answers like the HF zero-shot endpoint, ranking labels by a hash of text and label."""
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        texts = payload['inputs'] if isinstance(payload['inputs'], list) else [payload['inputs']]
+        labels = payload['parameters']['candidate_labels']
+        result = []
+        for text in texts:
+            ranked = sorted(labels, key=lambda label: hash((text, label)))
+            result.append({'sequence': text, 'labels': ranked, 'scores': [1.0 / len(ranked)] * len(ranked)})
+
+        body = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_in_thread(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    # nearest-rank
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(name, base_url, send, total, concurrency):
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    issued = itertools.count()
+
+    def worker():
+        session = requests.Session()
+        state = {}
+        while next(issued) < total:
+            start = time.perf_counter()
+            try:
+                status = send(session, base_url, state).status_code
+            except requests.RequestException:
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'scenario': name,
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'seconds': wall,
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50_ms': 1000 * percentile(latencies, 50),
+        'p95_ms': 1000 * percentile(latencies, 95),
+        'p99_ms': 1000 * percentile(latencies, 99),
+        'max_ms': 1000 * latencies[-1] if latencies else 0.0,
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)}
+    }
+
+
+def create_poll(base_url, title, poll_type):
+    response = requests.post(f"{base_url}/api/addPolls", data={'title': title, 'poll_type': poll_type})
+    response.raise_for_status()
+    poll_id = response.json()['poll_id']
+    options = requests.get(f"{base_url}/api/getPollOptions/{poll_id}").json()['options']
+    return poll_id, [option['id'] for option in options]
+
+
+def build_scenarios(base_url, args):
+    yes_no_poll, yes_no_options = create_poll(base_url, "Should the city keep libraries open later?", 'yes_no')
+    short_poll, _ = create_poll(base_url, "What should the city spend more on for young people?", 'short_answer')
+    today = date.today()
+    months = [f"{(today.year * 12 + today.month - 1 + d) // 12}-{(today.month - 1 + d) % 12 + 1:02d}" for d in range(-6, 7)]
+
+    def vote_yes_no(session, url, state):
+        return session.post(f"{url}/api/pollResponse/{yes_no_poll}/", json={
+            'selected_option_id': random.choice(yes_no_options),
+            'voter_token': uuid.uuid4().hex
+        })
+
+    def vote_short_answer(session, url, state):
+        return session.post(f"{url}/api/pollResponse/{short_poll}/", json={
+            'text_response': f"{random.choice(ANSWERS)} ({random.choice(TOPICS)})",
+            'voter_token': uuid.uuid4().hex
+        })
+
+    def inbox(session, url, state):
+        # page through like a client scrolling the inbox, restarting after a few pages
+        params = {'limit': app.CONFIG['messages_page_size']}
+        if state.get('unread'):
+            params['unread'] = 'true'
+        if state.get('cursor') and state.get('pages', 0) < args.inbox_pages:
+            params['cursor'] = state['cursor']
+            state['pages'] += 1
+        else:
+            state['pages'] = 1
+            state['unread'] = random.random() < 0.5
+        response = session.get(f"{url}/api/messages", params=params)
+        state['cursor'] = response.headers.get('X-Next-Cursor')
+        return response
+
+    def stats(session, url, state):
+        return session.get(f"{url}/api/messages/stats")
+
+    def calendar(session, url, state):
+        if random.random() < 0.5:
+            return session.get(f"{url}/api/getEvent", params={'month': random.choice(months)})
+        return session.get(f"{url}/api/eventCounts", params={'month': random.choice(months)})
+
+    return {
+        'vote_yes_no': (vote_yes_no, None),
+        'vote_short_answer': (vote_short_answer, short_poll),
+        'messages_inbox': (inbox, None),
+        'messages_stats': (stats, None),
+        'messages_stats_refresh': (stats, None),
+        'calendar': (calendar, None)
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {r['scenario']: r for r in json.load(f)['results']}
+    print(f"\nAgainst {baseline_path}:")
+    for r in results:
+        base = baseline.get(r['scenario'])
+        if not base:
+            continue
+        deltas = []
+        for key in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms'):
+            change = (r[key] - base[key]) / base[key] if base[key] else 0.0
+            deltas.append(f"{key} {change:+.1%}")
+        print(f"  {r['scenario']:<24}{'  '.join(deltas)}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against a local Postgres with a stubbed HuggingFace endpoint")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--dsn', help="scratch database to use; its tables are truncated and reseeded")
+    target.add_argument('--initdb', action='store_true', help="create a temporary cluster with initdb/pg_ctl")
+    parser.add_argument('--pg-bin', default=None, help="directory holding initdb and pg_ctl")
+    parser.add_argument('--scenarios', default=None, help="comma separated scenario names (default: all)")
+    parser.add_argument('--requests', type=int, default=2000, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--inbox-pages', type=int, default=5, help="pages a simulated client scrolls before starting over")
+    parser.add_argument('--vote-mode', choices=['direct', 'buffered'], default=app.CONFIG['vote_ingest_mode'])
+    parser.add_argument('--classifier', choices=sorted(app.CLASSIFIER_BACKENDS), default=app.CONFIG['classifier_backend'])
+    parser.add_argument('--hf-latency', type=float, default=0.05, help="seconds the stub endpoint waits per call")
+    parser.add_argument('--hf-error-rate', type=float, default=0.0, help="share of stub calls answered with 503")
+    parser.add_argument('--drain-timeout', type=float, default=60.0, help="how long to wait for background categorization")
+    parser.add_argument('--baseline', default=None, help="write results to this JSON file")
+    parser.add_argument('--compare', default=None, help="compare results to an earlier baseline JSON file")
+    args = parser.parse_args()
+
+    cluster = TempCluster(args.pg_bin) if args.initdb else None
+    servers = []
+    try:
+        settings = cluster.start() if cluster else dsn_settings(args.dsn)
+        app.CONFIG.update(settings)
+        app.CONFIG['pool_max'] = max(app.CONFIG['pool_max'], args.concurrency + 4)
+        app.CONFIG['vote_ingest_mode'] = args.vote_mode
+        app.CONFIG['classifier_backend'] = args.classifier
+        app.CONFIG['categorize_backoff'] = 0.05
+
+        print(f"Seeding {args.messages} messages and {args.events} events...")
+        version = prepare_database(settings, args.messages, args.events)
+
+        StubZeroShot.latency = args.hf_latency
+        StubZeroShot.error_rate = args.hf_error_rate
+        stub = start_in_thread(ThreadingHTTPServer(('127.0.0.1', 0), StubZeroShot))
+        servers.append(stub)
+        app.ZERO_SHOT_URL = f"http://127.0.0.1:{stub.server_address[1]}/"
+        # without a token the HF backend skips the remote call entirely
+        app.HF_API_TOKEN = 'bench-stub'
+        app.HF_HEADERS = {"Authorization": f"Bearer {app.HF_API_TOKEN}"}
+
+        api = start_in_thread(make_server('127.0.0.1', 0, app.app, threaded=True))
+        servers.append(api)
+        base_url = f"http://127.0.0.1:{api.server_port}"
+        app.start_categorization_workers()
+
+        scenarios = build_scenarios(base_url, args)
+        names = args.scenarios.split(',') if args.scenarios else list(scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        results = []
+        for name in names:
+            send, categorized_poll = scenarios[name]
+            stats_ttl = app.CONFIG['message_stats_ttl']
+            if name == 'messages_stats_refresh':
+                # every request recounts instead of hitting the TTL cache
+                app.CONFIG['message_stats_ttl'] = 0
+            try:
+                result = run_scenario(name, base_url, send, args.requests, args.concurrency)
+            finally:
+                app.CONFIG['message_stats_ttl'] = stats_ttl
+
+            if categorized_poll is not None:
+                started = time.perf_counter()
+                while ((app.vote_buffer.pending() or pending_categorizations(settings, categorized_poll))
+                       and time.perf_counter() - started < args.drain_timeout):
+                    time.sleep(0.1)
+                result['categorization_drain_s'] = time.perf_counter() - started
+                result['categorization_pending'] = pending_categorizations(settings, categorized_poll)
+            results.append(result)
+            print(f"{name:<24}{result['throughput']:>9.0f} req/s  p50 {result['p50_ms']:7.1f}ms  "
+                  f"p95 {result['p95_ms']:7.1f}ms  p99 {result['p99_ms']:7.1f}ms  {result['statuses']}")
+
+        classifier = app.get_classifier().stats()
+        print(f"classifier {classifier['backend']}: {classifier['calls']} calls, {classifier['fallbacks']} fallbacks")
+
+        if args.compare:
+            compare(results, args.compare)
+
+        if args.baseline:
+            with open(args.baseline, 'w') as f:
+                json.dump({
+                    'revision': git_revision(),
+                    'postgres': version,
+                    'settings': {
+                        'requests': args.requests,
+                        'concurrency': args.concurrency,
+                        'messages': args.messages,
+                        'events': args.events,
+                        'vote_mode': args.vote_mode,
+                        'classifier': args.classifier,
+                        'hf_latency': args.hf_latency,
+                        'hf_error_rate': args.hf_error_rate
+                    },
+                    'results': results
+                }, f, indent=2)
+    finally:
+        for server in servers:
+            server.shutdown()
+        app.vote_buffer.stop()
+        if app._pool is not None:
+            app._pool.closeall()
+        if cluster:
+            cluster.stop()
+
+
+if __name__ == '__main__':
+    main()
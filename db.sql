@@ -1,2 +1,150 @@
-SELECT * FROM poll_options;
+CREATE TABLE IF NOT EXISTS rep_connect_messages (
+    id SERIAL PRIMARY KEY,
+    sender VARCHAR(255) NOT NULL,
+    sender_email VARCHAR(255) NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TIMESTAMP NOT NULL DEFAULT NOW(),
+    is_read BOOLEAN NOT NULL DEFAULT FALSE
+);
 
+CREATE TABLE IF NOT EXISTS events (
+    id SERIAL PRIMARY KEY,
+    event_name VARCHAR(255) NOT NULL,
+    event_date DATE NOT NULL,
+    event_time VARCHAR(50),
+    event_desc TEXT
+);
+
+CREATE TABLE IF NOT EXISTS polls (
+    id SERIAL PRIMARY KEY,
+    title TEXT NOT NULL,
+    poll_type VARCHAR(20) NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS poll_options (
+    id SERIAL PRIMARY KEY,
+    poll_id INTEGER NOT NULL REFERENCES polls(id) ON DELETE CASCADE,
+    option_text TEXT NOT NULL,
+    option_order INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS poll_responses (
+    id SERIAL PRIMARY KEY,
+    poll_id INTEGER NOT NULL REFERENCES polls(id) ON DELETE CASCADE,
+    selected_option_id INTEGER REFERENCES poll_options(id) ON DELETE SET NULL,
+    text_response TEXT,
+    category VARCHAR(255),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+
+-- Inbox paging: keyset on (timestamp, id), newest first.
+-- The unread partial index also keeps the unread count in /api/messages/stats cheap.
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp_id
+    ON rep_connect_messages (timestamp DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_messages_unread_timestamp_id
+    ON rep_connect_messages (timestamp DESC, id DESC)
+    WHERE NOT is_read;
+
+CREATE INDEX IF NOT EXISTS idx_messages_sender_email
+    ON rep_connect_messages (lower(sender_email), timestamp DESC, id DESC);
+
+
+-- Running vote counts, updated in the same transaction as each response
+CREATE TABLE IF NOT EXISTS poll_option_tallies (
+    poll_id INTEGER NOT NULL REFERENCES polls(id) ON DELETE CASCADE,
+    option_id INTEGER NOT NULL REFERENCES poll_options(id) ON DELETE CASCADE,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (poll_id, option_id)
+);
+
+CREATE TABLE IF NOT EXISTS poll_category_tallies (
+    poll_id INTEGER NOT NULL REFERENCES polls(id) ON DELETE CASCADE,
+    category VARCHAR(255) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (poll_id, category)
+);
+
+
+-- Calendar range queries (month view, upcoming window) and per-day counts
+CREATE INDEX IF NOT EXISTS idx_events_date_time
+    ON events (event_date, event_time);
+
+
+-- One vote per voter per poll. voter_token holds a sha256 of the client's device token.
+ALTER TABLE poll_responses ADD COLUMN IF NOT EXISTS voter_token CHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_poll_responses_voter
+    ON poll_responses (poll_id, voter_token)
+    WHERE voter_token IS NOT NULL;
+
+
+-- Progress of resumable maintenance jobs (e.g. flask recategorize)
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    job_name VARCHAR(100) PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0,
+    processed BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP
+);
+
+
+-- Near-duplicate detection: MinHash signature per message plus LSH bucket lookups.
+-- duplicate_group is the id of the first message in the group (NULL = its own group).
+ALTER TABLE rep_connect_messages ADD COLUMN IF NOT EXISTS minhash BYTEA;
+ALTER TABLE rep_connect_messages ADD COLUMN IF NOT EXISTS duplicate_group INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_messages_duplicate_group
+    ON rep_connect_messages ((COALESCE(duplicate_group, id)), timestamp DESC, id DESC);
+
+-- Only messages that start a group (duplicate_group IS NULL) have buckets.
+CREATE TABLE IF NOT EXISTS message_lsh_buckets (
+    bucket BIGINT NOT NULL,
+    message_id INTEGER NOT NULL REFERENCES rep_connect_messages(id) ON DELETE CASCADE,
+    PRIMARY KEY (bucket, message_id)
+);
+
+-- Running counts per duplicate group for the unfiltered grouped inbox, updated with each
+-- message write. `flask dedupe-messages` fills it for existing messages.
+CREATE TABLE IF NOT EXISTS message_groups (
+    group_id INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0,
+    unread INTEGER NOT NULL DEFAULT 0,
+    latest TIMESTAMP NOT NULL,
+    latest_id INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_message_groups_latest
+    ON message_groups (latest DESC, group_id DESC);
+
+
+-- Full-text search (/api/search)
+ALTER TABLE rep_connect_messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(sender, '') || ' ' || coalesce(content, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_messages_search
+    ON rep_connect_messages USING GIN (search_vector);
+
+ALTER TABLE poll_responses ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(text_response, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_poll_responses_search
+    ON poll_responses USING GIN (search_vector);
+
+
+-- Active poll list; stays small however many expired polls pile up
+CREATE INDEX IF NOT EXISTS idx_polls_active
+    ON polls (created_at DESC, id DESC)
+    WHERE is_active;
+
+
+-- Lease for recovering pending categorizations: each worker process claims the rows it re-queues
+ALTER TABLE poll_responses ADD COLUMN IF NOT EXISTS categorize_claimed_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_poll_responses_pending
+    ON poll_responses (id)
+    WHERE category = 'pending';
@@ -0,0 +1,95 @@
+import argparse
+import os
+
+import app as nextup
+
+
+def preload():
+    # Runs once in the parent so forked workers share the loaded models copy-on-write
+    classifier = nextup.warm_up()
+    print(f"Warmed up {classifier.name} classifier")
+    try:
+        print(f"Loaded {nextup.voter_registry.load_active_polls()} voter tokens for active polls")
+    except Exception as e:
+        print(f"Could not preload voter tokens: {str(e)}")
+    # connections opened for the preload must not leak into the workers
+    nextup.close_pool()
+
+
+def post_fork(server, worker):
+    nextup.reset_after_fork()
+    nextup.start_background_threads()
+
+
+def worker_exit(server, worker):
+    # in-flight requests have drained by now; flush what they buffered
+    nextup.vote_buffer.stop(timeout=server.cfg.graceful_timeout)
+    nextup.close_pool()
+
+
+def serve_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class NextUpApplication(BaseApplication):
+
+        def load_config(self):
+            for key, value in {
+                'bind': args.bind,
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread',
+                'preload_app': True,
+                'timeout': args.timeout,
+                'graceful_timeout': args.graceful_timeout,
+                'keepalive': 5,
+                'post_fork': post_fork,
+                'worker_exit': worker_exit
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            preload()
+            return nextup.app
+
+    NextUpApplication().run()
+
+
+def serve_werkzeug(args):
+    from werkzeug.serving import run_simple
+
+    print("gunicorn is not installed; serving from one threaded process")
+    preload()
+    nextup.start_background_threads()
+    host, _, port = args.bind.rpartition(':')
+    try:
+        run_simple(host or '0.0.0.0', int(port), nextup.app, threaded=True)
+    finally:
+        nextup.vote_buffer.stop(timeout=args.graceful_timeout)
+        nextup.close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the NextUp API with production workers")
+    parser.add_argument('--bind', default=os.environ.get('NEXTUP_BIND', '0.0.0.0:8000'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('NEXTUP_WORKERS', os.cpu_count() or 1)),
+                        help="worker processes (default: one per core)")
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('NEXTUP_THREADS', 8)),
+                        help="threads per worker; each open /api/stream connection holds one")
+    parser.add_argument('--timeout', type=int, default=60)
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help="seconds a stopping worker gets to finish in-flight requests")
+    args = parser.parse_args()
+
+    # each worker gets its own pool, so keep the total under Postgres' max_connections
+    nextup.CONFIG['pool_max'] = min(nextup.CONFIG['pool_max'], args.threads + 2)
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        serve_werkzeug(args)
+    else:
+        serve_gunicorn(args)
+
+
+if __name__ == '__main__':
+    main()